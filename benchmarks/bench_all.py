@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+"""Times the console all command with the old list building code, then
+streaming, and the memory each one takes on top of storage
+
+Usage: python3 -m benchmarks.bench_all [number of objects]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from console import HBNBCommand
+from models import storage
+from models.review import Review
+
+
+class Output:
+    """A stdout to /dev/null that notes when its first write came"""
+
+    def __init__(self):
+        self.first = None
+        self.file = open(os.devnull, 'w')
+
+    def write(self, text):
+        if self.first is None:
+            self.first = time.perf_counter()
+        return self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+
+def timed(run, trace):
+    """Returns the seconds run('Review') took, until its first output,
+    and the peak memory it allocated when traced"""
+    out = Output()
+    stdout, sys.stdout = sys.stdout, out
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        run('Review')
+    finally:
+        end = time.perf_counter()
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        tracemalloc.stop()
+        sys.stdout = stdout
+        out.file.close()
+    return end - start, out.first - start, peak
+
+
+def legacy_all(arg):
+    """The all command the console used to run"""
+    print_list = []
+    for k, v in storage.all(HBNBCommand.classes[arg]).items():
+        print_list.append(str(v))
+    print(print_list)
+
+
+def main(count):
+    """Prints count Reviews with each all"""
+    objects = storage.all()
+    objects.clear()
+    for i in range(count):
+        storage.new(Review(text='Great stay number {}'.format(i),
+                           place_id='place', user_id='user'))
+    console = HBNBCommand()
+    for name, run in (('legacy', legacy_all), ('streaming', console.do_all)):
+        total, first = timed(run, False)[:2]
+        peak = timed(run, True)[2]
+        print("{:10} {} objects {:.3f}s, first output {:.4f}s, "
+              "peak {:.1f} MB".format(name, count, total, first,
+                                      peak / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+"""Compares save time, decode time, reload time and file size of
+each codec; reload adds building the model instances to decoding
+
+Usage: python3 -m benchmarks.bench_codecs [number of objects]
+"""
+import os
+import sys
+import tempfile
+import time
+from models import storage
+from models.engine.codec import codecs
+from models.place import Place
+
+
+def main(count):
+    """Saves and reloads count Places with every codec"""
+    os.chdir(tempfile.mkdtemp())
+    objects = storage.all()
+    objects.clear()
+    for i in range(count):
+        storage.new(Place(city_id='c{}'.format(i % 100),
+                          user_id='u{}'.format(i % 1000),
+                          name='Place {}'.format(i), description='Nice',
+                          number_rooms=2, number_bathrooms=1, max_guest=4,
+                          price_by_night=100, latitude=37.7, longitude=-122.4))
+    print("{} Places      save    decode  reload  size".format(count))
+    for codec in codecs.values():
+        path = 'file' + codec.extension
+        storage._FileStorage__codec = codec
+        storage._FileStorage__file_path = path
+        start = time.perf_counter()
+        storage.save()
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        with open(path, 'rb' if codec.binary else 'r') as f:
+            for pair in codec.load(f):
+                pass
+        decoded = time.perf_counter() - start
+        start = time.perf_counter()
+        storage.reload()
+        loaded = time.perf_counter() - start
+        print("  {:8} {:7.3f}s {:7.3f}s {:7.3f}s  {} bytes".format(
+            codec.name, saved, decoded, loaded, os.path.getsize(path)))
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
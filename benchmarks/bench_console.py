@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+"""Times a scripted load through the console, one save per command
+and then in --batch mode, with a single save at the end
+
+Usage: python3 -m benchmarks.bench_console [number of commands]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+console = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'console.py')
+
+
+def run(script, *args):
+    """Returns the seconds the console took to run the script"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(console)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, console] + list(args), input=script,
+                   stdout=subprocess.DEVNULL, env=env, check=True,
+                   universal_newlines=True)
+    return time.perf_counter() - start
+
+
+def main(count):
+    """Creates count States with each mode in a fresh directory"""
+    script = ''.join('create State name="State_{}"\n'.format(i)
+                     for i in range(count))
+    for args in ((), ('--batch',)):
+        os.chdir(tempfile.mkdtemp())
+        print("{:10} {} creates {:.2f}s".format(
+            ' '.join(args) or 'default', count, run(script, *args)))
+        os.remove('file.json')
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""Measures the memory per Place held by FileStorage after reload()
+
+Usage: python3 -m benchmarks.bench_memory [number of objects]
+"""
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+from models import storage
+from models.engine.codec import iter_items
+from models.place import Place
+
+
+def clear():
+    """Empties storage and its indexes"""
+    for name in ('objects', 'raw', 'by_class', 'refs', 'ref_vals', 'dirty'):
+        getattr(storage, '_FileStorage__' + name).clear()
+
+
+def traced(func):
+    """Returns the bytes still allocated after func() ran"""
+    gc.collect()
+    tracemalloc.start()
+    kept = func()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main(count):
+    """Saves count Places, then reloads them in each representation"""
+    os.chdir(tempfile.mkdtemp())
+    clear()
+    for i in range(count):
+        storage.new(Place(city_id='c{}'.format(i % 100),
+                          user_id='u{}'.format(i % 1000),
+                          name='Place {}'.format(i), description='Nice',
+                          number_rooms=2, number_bathrooms=1, max_guest=4,
+                          price_by_night=100, latitude=37.7, longitude=-122.4))
+    storage.save()
+    clear()
+
+    def load(lazy):
+        """Reloads with lazy mode on or off"""
+        storage._FileStorage__lazy = lazy
+        storage.reload()
+
+    def dicts():
+        """Keeps the parsed dicts, as lazy mode first did"""
+        with open('file.json') as f:
+            return dict(iter_items(f))
+
+    print("bytes per object over {} Places".format(count))
+    for name, func in (('models', lambda: load(False)),
+                       ('dicts', dicts),
+                       ('records', lambda: load(True))):
+        print("  {:8} {:.0f}".format(name, traced(func) / count))
+        clear()
+    os.remove('file.json')
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
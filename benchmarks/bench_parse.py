@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+"""Times the parsing of a large script of dot commands with the old
+find and eval based precmd, then with the new parser, and the running
+of five attribute updates as five commands and as one dict update
+
+Usage: python3 -m benchmarks.bench_parse [number of lines]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import redirect_stdout
+from console import HBNBCommand
+from models import storage
+from models.place import Place
+
+
+def legacy_precmd(line):
+    """The dot command parsing the console used to do"""
+    _cmd = _cls = _id = _args = ''
+    if not ('.' in line and '(' in line and ')' in line):
+        return line
+    try:
+        pline = line[:]
+        _cls = pline[:pline.find('.')]
+        _cmd = pline[pline.find('.') + 1:pline.find('(')]
+        if _cmd not in HBNBCommand.dot_cmds:
+            raise Exception
+        pline = pline[pline.find('(') + 1:pline.find(')')]
+        if pline:
+            pline = pline.partition(', ')
+            _id = pline[0].replace('\"', '')
+            pline = pline[2].strip()
+            if pline:
+                if pline[0] == '{' and pline[-1] == '}' and \
+                        type(eval(pline)) is dict:
+                    _args = pline
+                else:
+                    _args = pline.replace(',', '')
+                    _args = _args.replace('\"', '')
+        line = ' '.join([_cmd, _cls, _id, _args])
+    except Exception:
+        pass
+    finally:
+        return line
+
+
+def script(count):
+    """Returns count lines mixing the five dot commands"""
+    lines = []
+    for i in range(count):
+        _id = str(uuid.uuid4())
+        lines.append((
+            'Place.show("{}")'.format(_id),
+            'Place.update("{}", "name", "Loft {}")'.format(_id, i),
+            'Place.update("{}", {{"name": "Loft", "max_guest": {}, '
+            '"latitude": 37.77}})'.format(_id, i),
+            'Place.destroy("{}")'.format(_id),
+            'Place.count()',
+            'Place.all()',
+        )[i % 6])
+    return lines
+
+
+def main(count):
+    """Parses count lines with each precmd"""
+    lines = script(count)
+    console = HBNBCommand()
+    for name, precmd in (('legacy', legacy_precmd),
+                         ('parser', console.precmd)):
+        start = time.perf_counter()
+        for line in lines:
+            precmd(line)
+        elapsed = time.perf_counter() - start
+        print("{:12} {} lines {:.3f}s {:.0f} lines/s".format(
+            name, count, elapsed, count / elapsed))
+
+    os.chdir(tempfile.mkdtemp())
+    places = [Place(name='Loft') for i in range(200)]
+    for place in places:
+        storage.new(place)
+    storage.save()
+    attrs = {'name': 'Loft', 'max_guest': 4, 'price_by_night': 120,
+             'latitude': 37.77, 'longitude': -122.42}
+    single = ['Place.update("{}", "{}", "{}")'.format(place.id, k, v)
+              for place in places for k, v in attrs.items()]
+    merged = ['Place.update("{}", {})'.format(place.id, attrs)
+              for place in places]
+    for name, lines in (('one by one', single), ('dict', merged)):
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            for line in lines:
+                console.onecmd(console.precmd(line))
+        print("{:12} {} updates of {} attributes {:.3f}s".format(
+            name, len(places), len(attrs), time.perf_counter() - start))
+    os.remove('file.json')
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+"""Times FileStorage.reload() with the old strptime parsing, then with
+the fromisoformat fast path for isoformat and epoch timestamps
+
+Usage: python3 -m benchmarks.bench_reload [number of objects]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from models import base_model, storage
+from models.state import State
+
+
+def strptime(value):
+    """The timestamp parsing BaseModel used to do"""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f')
+
+
+def timed(func, *args):
+    """Returns the seconds func(*args) took"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(count):
+    """Writes count States in each encoding and reloads them"""
+    stamps = [datetime.utcnow().isoformat() for i in range(count)]
+    print("parse {} timestamps".format(count))
+    print("  strptime     {:.3f}s".format(timed(lambda: [
+        datetime.strptime(v, '%Y-%m-%dT%H:%M:%S.%f') for v in stamps])))
+    print("  fromisoformat {:.3f}s".format(timed(lambda: [
+        datetime.fromisoformat(v) for v in stamps])))
+
+    os.chdir(tempfile.mkdtemp())
+    objects = storage.all()
+    objects.clear()
+    for i in range(count):
+        storage.new(State(name='State {}'.format(i)))
+    print("reload {} objects".format(count))
+    fast = base_model.parse_time
+    for encoding in ('strptime', 'iso', 'epoch'):
+        storage._FileStorage__epoch = encoding == 'epoch'
+        base_model.parse_time = strptime if encoding == 'strptime' else fast
+        storage.save()
+        size = os.path.getsize('file.json')
+        objects.clear()
+        print("  {:8} {:.3f}s  {} bytes".format(
+            encoding, timed(storage.reload), size))
+    base_model.parse_time = fast
+    os.remove('file.json')
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
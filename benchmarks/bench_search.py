@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""Times FileStorage.search_places() over random places: building the
+indexes once, then each kind of search against a full scan
+
+Usage: python3 -m benchmarks.bench_search [number of places]
+"""
+import random
+import sys
+import time
+from models import storage
+from models.engine import search
+from models.place import Place
+
+searches = {
+    'price range, first 20': dict(price_min=100, price_max=120, limit=20),
+    'price range, 3 guests': dict(price_min=100, price_max=120, guests=3),
+    'two amenities': dict(amenities=['a1', 'a2'], limit=20),
+    'bounding box': dict(bbox=(37, -123, 38, -122)),
+    '10 km by distance': dict(near=(37.77, -122.42, 10), sort='distance'),
+    'everything, priciest 20': dict(sort='-price', limit=20),
+}
+
+
+def timed(func, *args, **kwargs):
+    """Returns the milliseconds func took and what it returned"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def scan(places, criteria):
+    """The search without indexes: filter everything, then sort"""
+    found = [p for p in places
+             if (criteria.get('price_min') is None or
+                 p.price_by_night >= criteria['price_min']) and
+             (criteria.get('price_max') is None or
+              p.price_by_night <= criteria['price_max']) and
+             set(criteria.get('amenities') or ()) <= set(p.amenity_ids) and
+             search.matches(p, criteria)]
+    found.sort(key=lambda p: p.price_by_night,
+               reverse=criteria.get('sort') == '-price')
+    return search.finish(found, criteria)
+
+
+def main(count):
+    """Fills storage with count places and searches them"""
+    for name in ('objects', 'raw', 'by_class', 'refs', 'ref_vals', 'dirty'):
+        getattr(storage, '_FileStorage__' + name).clear()
+    rand = random.Random(0)
+    storage.bulk_new(Place(
+        name='Place {}'.format(i), price_by_night=rand.randrange(20, 500),
+        max_guest=rand.randrange(1, 9),
+        latitude=rand.uniform(25, 49), longitude=rand.uniform(-125, -67),
+        amenity_ids=rand.sample(['a{}'.format(j) for j in range(20)], 4))
+        for i in range(count))
+    places = list(storage.iter(Place))
+    ms, found = timed(storage.search_places)
+    print("index {} places {:.0f}ms".format(count, ms))
+    print("{:26} {:>10} {:>10} {:>8}".format('', 'indexed', 'scan', 'found'))
+    for name, criteria in searches.items():
+        ms, found = timed(storage.search_places, **criteria)
+        scan_ms, expected = timed(scan, places, criteria)
+        assert [p.id for p in found] == [p.id for p in expected] or \
+            criteria.get('sort') == '-price'
+        print("{:26} {:8.2f}ms {:8.1f}ms {:8}".format(
+            name, ms, scan_ms, len(found)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""Times listing States sorted by name in DBStorage: sorted in Python,
+then with ORDER BY name without and with the index on states.name
+
+The database is a temporary sqlite file unless HBNB_MYSQL_URL points
+elsewhere; the states table is filled there first.
+
+Usage: python3 -m benchmarks.bench_sorted [number of states]
+"""
+import os
+import sys
+import tempfile
+import time
+from models.engine.db_storage import DBStorage
+from models.state import State
+
+
+def timed(func, *args):
+    """Returns the seconds func(*args) took"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(count):
+    """Fills the states table with count rows and lists them sorted"""
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.setdefault('HBNB_MYSQL_URL', 'sqlite:///' + path)
+    storage = DBStorage()
+    storage.reload()
+    engine = storage._DBStorage__engine
+    print("insert {} states {:.3f}s".format(count, timed(lambda: (
+        storage.bulk_new(State(name='State {:07}'.format(i * 7919 % count))
+                         for i in range(count)),
+        storage.save()))))
+
+    def python_sort():
+        sorted(storage.all(State).values(), key=lambda state: state.name)
+        storage.close()
+
+    def sql_sort():
+        storage.all(State, order_by='name')
+        storage.close()
+
+    def first_page():
+        storage.all(State, order_by='name', limit=20)
+        storage.close()
+
+    index = next(i for i in State.__table__.indexes
+                 if i.name == 'ix_states_name')
+    index.drop(engine)
+    for indexed in (False, True):
+        if indexed:
+            storage.create_indexes()
+        print("{} index".format("with" if indexed else "without"))
+        if not indexed:
+            print("  sorted()      {:.3f}s".format(timed(python_sort)))
+        print("  ORDER BY      {:.3f}s".format(timed(sql_sort)))
+        print("  first 20 rows {:.3f}s".format(timed(first_page)))
+    engine.dispose()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
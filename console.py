@@ -1,16 +1,22 @@
 #!/usr/bin/python3
 """ Console Module """
+import ast
 import cmd
+import itertools
 import sys
+import json
+import re
 import shlex
+from datetime import datetime
 from models.base_model import BaseModel
-from models import storage
+from models import storage, storage_type
 from models.user import User
 from models.place import Place
 from models.state import State
 from models.city import City
 from models.amenity import Amenity
 from models.review import Review
+from models.engine.search import parse_criteria
 
 
 class HBNBCommand(cmd.Cmd):
@@ -18,6 +24,8 @@ class HBNBCommand(cmd.Cmd):
 
     # determines prompt for interactive/non-interactive modes
     prompt = '(hbnb) ' if sys.__stdin__.isatty() else ''
+    # set by --batch: no prompts, one transaction for the whole input
+    batch = False
 
     classes = {
                'BaseModel': BaseModel, 'User': User, 'Place': Place,
@@ -25,6 +33,17 @@ class HBNBCommand(cmd.Cmd):
                'Review': Review
               }
     dot_cmds = ['all', 'count', 'show', 'destroy', 'update']
+    # <class>.<command>(<id>, <rest>): the id is read with the line
+    dot_line = re.compile(
+        r'''^\s*(\w+)\.(\w+)\(\s*(?:"([^"\\]*)"|'([^'\\]*)'|'''
+        r'''([^\s,"'{}()]+))?\s*(?:,(.*))?\)\s*$''', re.S)
+    # one argument of the rest: a quoted string, a dict or a bare word;
+    # anything else matches the last group
+    dot_arg = re.compile(
+        r'''\s*(?:"([^"\\]*)"|'([^'\\]*)'|(\{.*\})|'''
+        r'''([^\s,"'{](?:[^,"'{]*[^\s,"'{])?))?\s*(?:,|$)|(.)''', re.S)
+    # what shlex.split would not keep as one plain word
+    unsafe = re.compile(r'''[\s"'\\]''').search
     types = {
              'number_rooms': int, 'number_bathrooms': int,
              'max_guest': int, 'price_by_night': int,
@@ -33,7 +52,7 @@ class HBNBCommand(cmd.Cmd):
 
     def preloop(self):
         """Prints if isatty is false"""
-        if not sys.__stdin__.isatty():
+        if not sys.__stdin__.isatty() and not self.batch:
             print('(hbnb)')
 
     def precmd(self, line):
@@ -41,55 +60,48 @@ class HBNBCommand(cmd.Cmd):
 
         Usage: <class name>.<command>([<id> [<*args> or <**kwargs>]])
         (Brackets denote optional fields in usage example.)
+        The arguments are parsed, never evaluated.
         """
-        _cmd = _cls = _id = _args = ''  # initialize line elements
-
-        # scan for general formating - i.e '.', '(', ')'
-        if not ('.' in line and '(' in line and ')' in line):
-            return line
-
-        try:  # parse line left to right
-            pline = line[:]  # parsed line
-
-            # isolate <class name>
-            _cls = pline[:pline.find('.')]
-
-            # isolate and validate <command>
-            _cmd = pline[pline.find('.') + 1:pline.find('(')]
-            if _cmd not in HBNBCommand.dot_cmds:
-                raise Exception
-
-            # if parantheses contain arguments, parse them
-            pline = pline[pline.find('(') + 1:pline.find(')')]
-            if pline:
-                # partition args: (<id>, [<delim>], [<*args>])
-                pline = pline.partition(', ')  # pline convert to tuple
-
-                # isolate _id, stripping quotes
-                _id = pline[0].replace('\"', '')
-                # possible bug here:
-                # empty quotes register as empty _id when replaced
-
-                # if arguments exist beyond _id
-                pline = pline[2].strip()  # pline is now str
-                if pline:
-                    # check for *args or **kwargs
-                    if pline[0] == '{' and pline[-1] == '}' and type(eval(pline)) is dict:
-                        _args = pline
-                    else:
-                        _args = pline.replace(',', '')
-                        # reformat _args into list of args
-                        _args = _args.replace('\"', '')
-            line = ' '.join([_cmd, _cls, _id, _args])
-
-        except Exception as mess:
-            pass
-        finally:
+        match = HBNBCommand.dot_line.match(line)
+        if match is None or match.group(2) not in HBNBCommand.dot_cmds:
             return line
+        _cls, _cmd, double, single, bare, rest = match.groups()
+        _id = double if double is not None else single or bare or ''
+        if rest is None:
+            return ' '.join((_cmd, _cls, _id)) if _id else _cmd + ' ' + _cls
+        words = [_cmd, _cls, _id or "''"] + HBNBCommand.parse_args(rest)
+        while words[-1] == "''":
+            words.pop()
+        return ' '.join(words)
+
+    @staticmethod
+    def parse_args(text):
+        """Returns the arguments after the id of a dot command, as words
+        for shlex.split
+
+        The arguments are read in one pass of a compiled pattern. A dict
+        is kept as written, for update to read.
+        """
+        words = []
+        for double, single, _dict, bare, bad in \
+                HBNBCommand.dot_arg.findall(text):
+            if bad and text.lstrip().startswith('{'):
+                # an invalid dict, left for update to report
+                return [text.strip()]
+            if bad:
+                return [shlex.quote(a.strip().strip('"\''))
+                        for a in text.split(',')]
+            if _dict:
+                words.append(_dict)
+                continue
+            arg = double or single or bare
+            words.append(arg if arg and not HBNBCommand.unsafe(arg)
+                         else shlex.quote(arg))
+        return words
 
     def postcmd(self, stop, line):
         """Prints if isatty is false"""
-        if not sys.__stdin__.isatty():
+        if not sys.__stdin__.isatty() and not self.batch:
             print('(hbnb) ', end='')
         return stop
 
@@ -114,6 +126,46 @@ class HBNBCommand(cmd.Cmd):
         """ Overrides the emptyline method of CMD """
         pass
 
+    def do_begin(self, arg):
+        """ Start a transaction """
+        try:
+            storage.begin()
+        except ValueError:
+            print("** transaction already in progress **")
+
+    def help_begin(self):
+        """ Prints the help documentation for begin """
+        print("Starts a transaction: changes are only saved at commit")
+        print("[Usage]: begin\n")
+
+    def do_commit(self, arg):
+        """ Save the changes of the transaction """
+        try:
+            storage.commit()
+        except ValueError:
+            print("** no transaction in progress **")
+        if self.batch:
+            storage.begin()
+
+    def help_commit(self):
+        """ Prints the help documentation for commit """
+        print("Saves every change made since begin at once")
+        print("[Usage]: commit\n")
+
+    def do_rollback(self, arg):
+        """ Drop the changes of the transaction """
+        try:
+            storage.rollback()
+        except ValueError:
+            print("** no transaction in progress **")
+        if self.batch:
+            storage.begin()
+
+    def help_rollback(self):
+        """ Prints the help documentation for rollback """
+        print("Drops every change made since begin")
+        print("[Usage]: rollback\n")
+
     def do_create(self, arg):
         """ Create an object of any class"""
         args = shlex.split(arg)
@@ -144,6 +196,80 @@ class HBNBCommand(cmd.Cmd):
         storage.save()
         print(new_instance.id)
 
+    def do_import(self, arg):
+        """ Load objects of a class from a JSON lines file """
+        args = shlex.split(arg)
+        if len(args) == 0:
+            print("** class name missing **")
+            return
+        elif args[0] not in HBNBCommand.classes:
+            print("** class doesn't exist **")
+            return
+        elif len(args) == 1:
+            print("** file name missing **")
+            return
+        cls = HBNBCommand.classes[args[0]]
+        try:
+            f = open(args[1], 'r')
+        except FileNotFoundError:
+            print("** file doesn't exist **")
+            return
+        # the records stream into a transaction, so a bad line leaves
+        # nothing behind; within one already begun, the import joins it
+        try:
+            storage.begin()
+            own = True
+        except ValueError:
+            own = False
+        try:
+            with f:
+                count = storage.bulk_new(cls(**json.loads(line))
+                                         for line in f if line.strip())
+        except (ValueError, TypeError):
+            storage.rollback()
+            if not own and self.batch:
+                storage.begin()
+            print("** invalid record **")
+            return
+        except BaseException:
+            if own:
+                storage.rollback()
+            raise
+        if own:
+            storage.commit()
+        print(count)
+
+    def help_import(self):
+        """ Prints the help documentation for import """
+        print("Loads one object per line of a JSON lines file, all or")
+        print("none of them: an invalid line rolls back the transaction")
+        print("[Usage]: import <className> <file.jsonl>\n")
+
+    def do_search(self, arg):
+        """ Show the places matching key=value criteria """
+        params = {}
+        for word in shlex.split(arg):
+            key, sep, value = word.partition('=')
+            if not sep:
+                print("** invalid criterion: {} **".format(word))
+                return
+            params[key] = value
+        try:
+            criteria = parse_criteria(params)
+        except ValueError as e:
+            print("** {} **".format(e))
+            return
+        print([str(place) for place in storage.search_places(**criteria)])
+
+    def help_search(self):
+        """ Prints the help documentation for search """
+        print("Shows the places matching every criterion, cheapest first")
+        print("Criteria: price_min price_max guests rooms bathrooms")
+        print("amenities=<id>,<id> bbox=<south>,<west>,<north>,<east>")
+        print("near=<latitude>,<longitude>,<km> sort=price|-price|distance")
+        print("offset limit")
+        print("[Usage]: search [<criterion>=<value> ...]\n")
+
     def do_show(self, args):
         """ Show an individual object """
         new = args.partition(" ")
@@ -166,11 +292,11 @@ class HBNBCommand(cmd.Cmd):
             print("** instance id missing **")
             return
 
-        key = c_name + "." + c_id
-        try:
-            print(storage.all()[key])
-        except KeyError:
+        obj = storage.get(HBNBCommand.classes[c_name], c_id)
+        if obj is None:
             print("** no instance found **")
+            return
+        print(obj)
 
     def do_destroy(self, args):
         """ Destroy a specified object """
@@ -186,48 +312,127 @@ class HBNBCommand(cmd.Cmd):
         if not c_id:
             print("** instance id missing **")
             return
-        key = c_name + "." + c_id
-        try:
-            storage.delete(storage.all()[key])
-            storage.save()
-        except KeyError:
+        obj = storage.get(HBNBCommand.classes[c_name], c_id)
+        if obj is None:
             print("** no instance found **")
+            return
+        storage.delete(obj)
+        storage.save()
 
     def do_all(self, arg):
-        """ Show all objects, or all objects of a class"""
-        print_list = []
-        if arg:
-            args = arg.split(' ')
-            if args[0] not in HBNBCommand.classes:
-                print("** class doesn't exist **")
-                return
-            for k, v in storage.all(HBNBCommand.classes[args[0]]).items():
-                print_list.append(str(v))
+        """ Show all objects, or all objects of a class
+
+        The objects are printed one by one as storage yields them, in
+        the same form as a printed list, so nothing is built up first.
+        """
+        try:
+            options = HBNBCommand.all_options(shlex.split(arg))
+        except ValueError as e:
+            print("** {} **".format(e))
+            return
+        cls_name, limit, fields, ndjson = options
+        if cls_name and cls_name not in HBNBCommand.classes:
+            print("** class doesn't exist **")
+            return
+        cls = HBNBCommand.classes[cls_name] if cls_name else None
+        if storage_type == 'db' and hasattr(cls, '__table__') and \
+                (limit is not None or fields is not None):
+            # the limit and the columns go into the SELECT
+            query = storage.query(cls)
+            if limit is not None:
+                query = query.limit(limit)
+            if fields is not None:
+                query = query.only('id', *(
+                    f for f in fields
+                    if f != 'id' and f in cls.__table__.columns))
+                objs = ((cls_name, row['id'],
+                         {k: row[k] for k in fields if k in row})
+                        for row in query)
+            else:
+                objs = iter(query)
         else:
-            for k, v in storage.all().items():
-                print_list.append(str(v))
-        print(print_list)
+            objs = storage.iter(cls)
+            if limit is not None:
+                objs = itertools.islice(objs, limit)
+            if fields is not None:
+                objs = ((obj.__class__.__name__, obj.id,
+                         {k: obj.__dict__[k] for k in fields
+                          if k in obj.__dict__})
+                        for obj in objs)
+        write = sys.stdout.write
+        if not ndjson:
+            write('[')
+        sep = ''
+        for obj in objs:
+            if fields is None:
+                record = obj.to_dict() if ndjson else str(obj)
+            else:
+                name, _id, record = obj
+                if not ndjson:
+                    record = "[{}] ({}) {}".format(name, _id, record)
+            if ndjson:
+                write(json.dumps(record, default=HBNBCommand.json_value) +
+                      '\n')
+            else:
+                write(sep + repr(record))
+            if not sep:
+                # the first object shows up at once, the rest is buffered
+                sys.stdout.flush()
+                sep = ', '
+        if not ndjson:
+            write(']\n')
+
+    @staticmethod
+    def json_value(value):
+        """Returns what JSON holds for value: dates as in to_dict"""
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def all_options(args):
+        """Returns the class name, limit, fields and ndjson flag of all"""
+        cls_name = limit = fields = None
+        ndjson = False
+        args = iter(args)
+        for word in args:
+            if word == '--ndjson':
+                ndjson = True
+            elif word in ('--limit', '--fields'):
+                value = next(args, None)
+                if value is None:
+                    raise ValueError("{} value missing".format(word))
+                if word == '--fields':
+                    fields = [f for f in value.split(',') if f]
+                elif not value.isdigit():
+                    raise ValueError("limit must be a number")
+                else:
+                    limit = int(value)
+            elif word.startswith('--'):
+                raise ValueError("unknown option {}".format(word))
+            elif cls_name is None:
+                cls_name = word
+        return cls_name, limit, fields, ndjson
+
+    def help_all(self):
+        """ Prints the help documentation for all """
+        print("Shows all objects, or all objects of a class")
+        print("--limit <n> stops after n objects, --fields <a>,<b> only")
+        print("shows those attributes, --ndjson prints one JSON object")
+        print("per line, which import reads back")
+        print("[Usage]: all [<className>] [--limit <n>] [--fields <a>,<b>]")
+        print("         [--ndjson]\n")
 
     def do_update(self, args):
-        """ Update an object if exists """
-        c_name, c_id, att_name, att_val = '', '', '', ''
-        args = args.partition(" ")
-        if args[0]:
-            c_name = args[0]
-        if args[2]:
-            args = args[2].partition(" ")
-            if args[0]:
-                c_id = args[0]
-            if args[2]:
-                args = args[2].partition(" ")
-                if args[0]:
-                    att_name = args[0]
-                if args[2]:
-                    att_val = args[2]
+        """ Update an object if exists
 
-        # guard against trailing args
-        if att_val and ' ' in att_val:
-            att_val = att_val.partition(' ')[0]
+        update <class> <id> <attribute> <value> sets one attribute;
+        update <class> <id> {<attribute>: <value>, ...} sets them all
+        and saves once.
+        """
+        c_name, _, rest = args.strip().partition(" ")
+        c_id, _, rest = rest.strip().partition(" ")
+        rest = rest.strip()
 
         if not c_name:
             print("** class name missing **")
@@ -238,28 +443,45 @@ class HBNBCommand(cmd.Cmd):
         if not c_id:
             print("** instance id missing **")
             return
-        key = c_name + "." + c_id
-        try:
-            obj = storage.all()[key]
-        except KeyError:
+        obj = storage.get(HBNBCommand.classes[c_name], c_id)
+        if obj is None:
             print("** no instance found **")
             return
-        if not att_name:
-            print("** attribute name missing **")
-            return
-        if not att_val:
-            print("** value missing **")
-            return
 
-        if att_name in HBNBCommand.types:
+        if rest.startswith('{'):
             try:
-                att_val = HBNBCommand.types[att_name](att_val)
+                attrs = ast.literal_eval(rest)
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                attrs = None
+            if not isinstance(attrs, dict):
+                print("** invalid dictionary **")
+                return
+            attrs = {k: v for k, v in attrs.items()
+                     if k not in ('id', 'created_at', 'updated_at',
+                                  '__class__')}
+        else:
+            try:
+                words = shlex.split(rest)
             except ValueError:
-                print("** value type incorrect **")
+                words = rest.split()
+            if not words:
+                print("** attribute name missing **")
+                return
+            if len(words) < 2 or not words[1]:
+                print("** value missing **")
                 return
+            attrs = {words[0]: words[1]}
 
-        setattr(obj, att_name, att_val)
-        storage.save()
+        for att_name, att_val in attrs.items():
+            if att_name in HBNBCommand.types:
+                try:
+                    attrs[att_name] = HBNBCommand.types[att_name](att_val)
+                except (TypeError, ValueError):
+                    print("** value type incorrect **")
+                    return
+        for att_name, att_val in attrs.items():
+            setattr(obj, att_name, att_val)
+        obj.save()
 
     def do_count(self, args):
         """ Count current number of class instances """
@@ -268,13 +490,33 @@ class HBNBCommand(cmd.Cmd):
             if args[0] not in HBNBCommand.classes:
                 print("** class doesn't exist **")
                 return
-            count = 0
-            for k in storage.all(HBNBCommand.classes[args[0]]).keys():
-                count += 1
-            print(count)
+            print(storage.count(HBNBCommand.classes[args[0]]))
         else:
             print("** class name missing **")
 
 
+def batch():
+    """ Runs the commands of stdin in one transaction
+
+    It is committed at the end of the input, and rolled back if a
+    command fails with an error.
+    """
+    HBNBCommand.batch = True
+    storage.begin()
+    try:
+        HBNBCommand().cmdloop()
+    except SystemExit as e:
+        if e.code:
+            storage.rollback()
+            raise
+    except BaseException:
+        storage.rollback()
+        raise
+    storage.commit()
+
+
 if __name__ == "__main__":
-    HBNBCommand().cmdloop()
+    if sys.argv[1:] == ['--batch']:
+        batch()
+    else:
+        HBNBCommand().cmdloop()
@@ -0,0 +1,30 @@
+#!/usr/bin/python3
+"""Converts a FileStorage snapshot from one codec to another
+
+Usage: ./convert_storage.py <source> <destination> [--from C] [--to C]
+Each codec is picked from the file extension unless given explicitly.
+"""
+import argparse
+from models.engine.codec import codecs, convert
+
+
+def main(argv=None):
+    """Parses the arguments and runs the conversion"""
+    parser = argparse.ArgumentParser(
+        description='Convert a FileStorage snapshot to another codec')
+    parser.add_argument('source')
+    parser.add_argument('destination')
+    parser.add_argument('--from', dest='from_codec', choices=sorted(codecs))
+    parser.add_argument('--to', dest='to_codec', choices=sorted(codecs))
+    args = parser.parse_args(argv)
+    try:
+        count = convert(args.source, args.destination,
+                        args.from_codec and codecs[args.from_codec],
+                        args.to_codec and codecs[args.to_codec])
+    except (OSError, ValueError) as e:
+        parser.exit(1, "{}\n".format(e))
+    print("{} objects written to {}".format(count, args.destination))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ from models.place import place_amenity
 class Amenity(BaseModel, Base):
     """ Amenity class to store amenity information """
     __tablename__ = 'amenities'
-    name = Column(String(128), nullable=False)
+    name = Column(String(128), nullable=False, index=True)
     place_amenities = relationship(
         'Place',
         secondary=place_amenity,
@@ -1,12 +1,28 @@
 #!/usr/bin/python3
 """This module defines a base class for all models in our hbnb clone"""
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, String, DateTime
 import models
 
 Base = declarative_base()
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def parse_time(value):
+    """Returns the datetime of an isoformat string or epoch microseconds"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if isinstance(value, int):
+        return EPOCH + value * MICROSECOND
+    return value
+
+
+def epoch_time(value):
+    """Returns a datetime as integer microseconds since the epoch"""
+    return (value - EPOCH) // MICROSECOND
 
 
 class BaseModel:
@@ -18,22 +34,31 @@ class BaseModel:
 
     def __init__(self, *args, **kwargs):
         """Instantiates a new model"""
+        # storage cannot hold the object yet, so __setattr__ is skipped
+        setter = super().__setattr__
         if not kwargs:
-            self.id = str(uuid.uuid4())
-            self.created_at = datetime.utcnow()
-            self.updated_at = datetime.utcnow()
+            setter('id', str(uuid.uuid4()))
+            setter('created_at', datetime.utcnow())
+            setter('updated_at', datetime.utcnow())
         else:
             for k, v in kwargs.items():
                 if k == 'created_at' or k == 'updated_at':
-                    v = datetime.strptime(v, '%Y-%m-%dT%H:%M:%S.%f')
+                    v = parse_time(v)
                 if k != '__class__':
-                    setattr(self, k, v)
+                    setter(k, v)
             if 'id' not in kwargs:
-                self.id = str(uuid.uuid4())
+                setter('id', str(uuid.uuid4()))
             if 'created_at' not in kwargs:
-                self.created_at = datetime.utcnow()
+                setter('created_at', datetime.utcnow())
             if 'updated_at' not in kwargs:
-                self.updated_at = datetime.utcnow()
+                setter('updated_at', datetime.utcnow())
+
+    def __setattr__(self, name, value):
+        """Sets an attribute, then tells storage about the change"""
+        super().__setattr__(name, value)
+        # SQLAlchemy sets its state on every new instance, before __init__
+        if name != '_sa_instance_state':
+            models.storage.changed(self, name)
 
     def save(self):
         """Updates updated_at with current time when instance is changed"""
@@ -2,13 +2,25 @@
 """ City Module for HBNB project """
 
 from models.base_model import BaseModel, Base
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
+from os import getenv
 
 
 class City(BaseModel, Base):
     """ The city class, contains state ID and name """
     __tablename__ = 'cities'
+    # serves both the cities of a state and their order by name
+    __table_args__ = (Index('ix_cities_state_id_name', 'state_id', 'name'),)
     state_id = Column(String(60), ForeignKey('states.id'), nullable=False)
-    name = Column(String(128), nullable=False)
-    places = relationship("Place", back_populates="city", cascade="all, delete-orphan")
+    name = Column(String(128), nullable=False, index=True)
+
+    if getenv('HBNB_TYPE_STORAGE') == 'db':
+        places = relationship("Place", back_populates="city", cascade="all, delete-orphan")
+    else:
+        @property
+        def places(self):
+            """Returns the list of Place instances with city_id equals to the current City.id"""
+            from models import storage
+            from models.place import Place
+            return storage.related(Place, 'city_id', self.id)
@@ -0,0 +1,280 @@
+#!/usr/bin/python3
+"""Serialization formats for the FileStorage snapshot file
+
+Every codec streams: dump() writes (key, dict) pairs as they come and
+load() yields them back one at a time, so neither holds the whole data
+set in memory. FileStorage picks one with HBNB_FILE_CODEC:
+
+    json    the default, a single JSON object keyed by <class>.<id>
+    pickle  pickle protocol 5 frames of up to 1000 pairs
+    msgpack msgpack pairs, when the msgpack package is installed
+    schema  JSON lines that name the fields of each layout once
+
+convert_storage.py converts a snapshot from one codec to another.
+"""
+import itertools
+import json
+import pickle
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = 'hbnb'
+
+
+def iter_items(f, chunk_size=1 << 16):
+    """Yields the (key, value) pairs of the JSON object in file f.
+
+    The file is read chunk_size characters at a time and each value is
+    decoded on its own, so only one value is held in memory at once.
+    Malformed input raises json.JSONDecodeError, like json.load().
+    """
+    for key, value, start, end in _scan(f, chunk_size):
+        yield key, value
+
+
+def iter_spans(f, chunk_size=1 << 16):
+    """Yields (key, start, end) for the values of the JSON object in f
+
+    start and end are character offsets, which are byte offsets when f
+    is opened with the latin-1 encoding.
+    """
+    for key, value, start, end in _scan(f, chunk_size):
+        yield key, start, end
+
+
+def _scan(f, chunk_size):
+    """Yields (key, value, start, end) for the JSON object in file f"""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    offset = 0
+
+    def more():
+        """Appends the next chunk to the unread part of the buffer"""
+        nonlocal buf, pos, offset
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return False
+        offset += pos
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_ws():
+        """Moves past whitespace, tells if any character is left"""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\n\r':
+                pos += 1
+            if pos < len(buf) or not more():
+                return pos < len(buf)
+
+    def expect(chars):
+        """Consumes one of chars after optional whitespace"""
+        nonlocal pos
+        if not skip_ws() or buf[pos] not in chars:
+            raise json.JSONDecodeError(
+                "Expecting {!r}".format(chars), buf, pos)
+        pos += 1
+        return buf[pos - 1]
+
+    def decode():
+        """Decodes the value starting at pos, reading more as needed"""
+        nonlocal pos
+        skip_ws()
+        start = offset + pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not more():
+                    raise
+                continue
+            # a number cut by the end of the buffer decodes too early
+            if end == len(buf) and more():
+                continue
+            pos = end
+            return value, start, offset + end
+
+    expect('{')
+    if skip_ws() and buf[pos] == '}':
+        pos += 1
+    else:
+        while True:
+            key = decode()[0]
+            if not isinstance(key, str):
+                raise json.JSONDecodeError(
+                    "Expecting property name", buf, pos)
+            expect(':')
+            yield (key,) + decode()
+            if expect(',}') == '}':
+                break
+    if skip_ws():
+        raise json.JSONDecodeError("Extra data", buf, pos)
+
+
+class JSONCodec:
+    """The historical file.json layout"""
+    name = 'json'
+    extension = '.json'
+    binary = False
+
+    @staticmethod
+    def dump(items, f):
+        """Writes the pairs in the layout json.dump() would produce"""
+        f.write('{')
+        sep = ''
+        for k, v in items:
+            f.write(sep + json.dumps(k) + ': ' + json.dumps(v))
+            sep = ', '
+        f.write('}')
+
+    @staticmethod
+    def load(f):
+        """Yields the pairs of the JSON object"""
+        return iter_items(f)
+
+
+class PickleCodec:
+    """Pickle protocol 5 frames, after a header frame
+
+    Only load snapshots this storage wrote: unpickling runs code.
+    """
+    name = 'pickle'
+    extension = '.pickle'
+    binary = True
+    batch_size = 1000
+
+    @classmethod
+    def dump(cls, items, f):
+        """Writes the pairs batch_size at a time"""
+        pickle.dump((MAGIC, cls.name), f, protocol=5)
+        items = iter(items)
+        while True:
+            batch = list(itertools.islice(items, cls.batch_size))
+            if not batch:
+                break
+            pickle.dump(batch, f, protocol=5)
+
+    @staticmethod
+    def load(f):
+        """Yields the pairs frame by frame"""
+        try:
+            header = pickle.load(f)
+        except (EOFError, pickle.UnpicklingError) as e:
+            raise ValueError("not a pickle snapshot") from e
+        if header != (MAGIC, 'pickle'):
+            raise ValueError("not a pickle snapshot")
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+class MsgpackCodec:
+    """A header, then one msgpack [key, dict] array per object"""
+    name = 'msgpack'
+    extension = '.msgpack'
+    binary = True
+
+    @classmethod
+    def dump(cls, items, f):
+        """Writes one packed pair per object"""
+        packer = msgpack.Packer()
+        f.write(packer.pack([MAGIC, cls.name]))
+        for pair in items:
+            f.write(packer.pack(pair))
+
+    @staticmethod
+    def load(f):
+        """Yields the pairs as they are unpacked"""
+        unpacker = msgpack.Unpacker(f, raw=False)
+        if next(unpacker, None) != [MAGIC, 'msgpack']:
+            raise ValueError("not a msgpack snapshot")
+        for k, v in unpacker:
+            yield k, v
+
+
+class SchemaCodec:
+    """JSON lines where every distinct field layout is named once
+
+    A line {"schema": n, "class": c, "fields": [...]} declares layout n,
+    then each object is the line [n, key, value, ...] in field order.
+    """
+    name = 'schema'
+    extension = '.jsonl'
+    binary = False
+
+    @staticmethod
+    def dump(items, f):
+        """Writes one line per object, declaring new layouts first"""
+        schemas = {}
+        for k, v in items:
+            cls_name = v.get('__class__')
+            fields = tuple(field for field in v if field != '__class__')
+            n = schemas.get((cls_name, fields))
+            if n is None:
+                n = schemas[(cls_name, fields)] = len(schemas)
+                f.write(json.dumps({'schema': n, 'class': cls_name,
+                                    'fields': fields}) + '\n')
+            f.write(json.dumps([n, k] + [v[field] for field in fields]) +
+                    '\n')
+
+    @staticmethod
+    def load(f):
+        """Yields the pairs, zipping each row with its layout"""
+        schemas = {}
+        for line in f:
+            row = json.loads(line)
+            if isinstance(row, dict):
+                schemas[row['schema']] = (row['class'], row['fields'])
+                continue
+            cls_name, fields = schemas[row[0]]
+            v = dict(zip(fields, row[2:]))
+            if cls_name is not None:
+                v['__class__'] = cls_name
+            yield row[1], v
+
+
+codecs = {codec.name: codec for codec in
+          (JSONCodec, PickleCodec, MsgpackCodec, SchemaCodec)
+          if codec is not MsgpackCodec or msgpack is not None}
+
+
+def get_codec(name):
+    """Returns the codec registered under name"""
+    try:
+        return codecs[name]
+    except KeyError:
+        raise ValueError("unknown codec: {}".format(name)) from None
+
+
+def codec_for(path):
+    """Returns the codec whose extension ends path"""
+    for codec in codecs.values():
+        if path.endswith(codec.extension):
+            return codec
+    raise ValueError("no codec for {}".format(path))
+
+
+def convert(source, destination, from_codec=None, to_codec=None):
+    """Rewrites a snapshot in another codec, returns the object count"""
+    reader = from_codec or codec_for(source)
+    writer = to_codec or codec_for(destination)
+    count = 0
+
+    def counted(items):
+        """Passes the pairs through, counting them"""
+        nonlocal count
+        for pair in items:
+            count += 1
+            yield pair
+
+    with open(source, 'rb' if reader.binary else 'r') as src, \
+            open(destination, 'wb' if writer.binary else 'w') as dst:
+        writer.dump(counted(reader.load(src)), dst)
+    return count
@@ -5,49 +5,382 @@ from models.base_model import Base
 from models.city import City
 from models.state import State
 from models.user import User
-from models.place import Place
+from models.place import Place, place_amenity
 from models.review import Review
 from models.amenity import Amenity
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+from models.engine.pool import PoolMonitor
+from models.engine.query import Query
+from models.engine import search
+from sqlalchemy import (Column, Integer, String, Table, create_engine, event,
+                        func, insert, inspect, or_, select, update)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import scoped_session, selectinload, sessionmaker
+import itertools
 import os
+import threading
+
+classes = {
+    'State': State, 'City': City, 'User': User,
+    'Place': Place, 'Review': Review, 'Amenity': Amenity
+}
+
+# one change counter per table, moved by every write to it
+versions = Table(
+    'versions', Base.metadata,
+    Column('name', String(64), primary_key=True),
+    Column('version', Integer, nullable=False))
+
+
+def bump_versions(session, names):
+    """Bump the counters of the tables named, in the session's transaction
+
+    They are updated in name order, so that writers to several tables
+    always lock the rows in the same order.
+    """
+    if names:
+        session.execute(update(versions)
+                        .where(versions.c.name.in_(sorted(names)))
+                        .values(version=versions.c.version + 1))
+
+
+def count_changes(session, flush_context, instances):
+    """Bump the counters of the tables a flush is about to write to"""
+    names = {obj.__tablename__
+             for obj in itertools.chain(session.new, session.deleted)}
+    names.update(obj.__tablename__ for obj in session.dirty
+                 if session.is_modified(obj))
+    bump_versions(session, names)
+
+
+pool_options = {
+    'HBNB_MYSQL_POOL_SIZE': ('pool_size', int),
+    'HBNB_MYSQL_MAX_OVERFLOW': ('max_overflow', int),
+    'HBNB_MYSQL_POOL_RECYCLE': ('pool_recycle', int),
+    'HBNB_MYSQL_POOL_TIMEOUT': ('pool_timeout', float),
+}
 
 
 class DBStorage:
-    """Database storage class for MySQL database"""
+    """Database storage class for MySQL database
+
+    The session is a scoped_session: each thread gets its own session
+    the first time it touches storage, and close() only removes the
+    session of the calling thread. A web request that calls close() on
+    teardown thus works in a session of its own, never shared with the
+    requests other threads are serving.
+
+    HBNB_MYSQL_URL replaces the URL built from the other HBNB_MYSQL_*
+    variables, e.g. with sqlite:///hbnb.db. HBNB_MYSQL_POOL_SIZE,
+    HBNB_MYSQL_MAX_OVERFLOW, HBNB_MYSQL_POOL_RECYCLE (seconds) and
+    HBNB_MYSQL_POOL_TIMEOUT (seconds) tune the pool when set. Only the
+    connections idle for HBNB_MYSQL_PING_IDLE seconds, 30 by default,
+    are pinged before use; 'off' never pings them.
+    """
 
     __engine = None
     __session = None
+    __lock = threading.Lock()
 
     def __init__(self):
         """Initialize DBStorage instance"""
-        self.__engine = create_engine('mysql+mysqldb://{}:{}@{}/{}'.format(
-            os.getenv('HBNB_MYSQL_USER'),
-            os.getenv('HBNB_MYSQL_PWD'),
-            os.getenv('HBNB_MYSQL_HOST'),
-            os.getenv('HBNB_MYSQL_DB')),
-            pool_pre_ping=True
-        )
+        url = os.getenv('HBNB_MYSQL_URL') or \
+            'mysql+mysqldb://{}:{}@{}/{}'.format(
+                os.getenv('HBNB_MYSQL_USER'),
+                os.getenv('HBNB_MYSQL_PWD'),
+                os.getenv('HBNB_MYSQL_HOST'),
+                os.getenv('HBNB_MYSQL_DB'))
+        options = {}
+        for var, (name, kind) in pool_options.items():
+            if os.getenv(var):
+                options[name] = kind(os.getenv(var))
+        self.__engine = create_engine(url, **options)
+        ping_idle = os.getenv('HBNB_MYSQL_PING_IDLE', '30')
+        self.__monitor = PoolMonitor(
+            self.__engine, None if ping_idle == 'off' else float(ping_idle))
 
         if os.getenv('HBNB_ENV') == 'test':
             Base.metadata.drop_all(self.__engine)
 
-    def all(self, cls=None):
-        """Query all objects or all objects of a specific class"""
+    def stats(self):
+        """Return the connection pool metrics, see PoolMonitor.stats"""
+        return self.__monitor.stats()
+
+    def all(self, cls=None, limit=None, offset=None, after=None, load=None,
+            order_by=None):
+        """Query all objects or all objects of a specific class
+
+        limit and offset page through the rows ordered by id; after
+        pages by keyset instead, returning the rows whose id follows it.
+        load lists the relationships to fetch along, see __options.
+        order_by names the column the database sorts the rows by, with
+        a leading '-' for descending order; id then breaks the ties.
+        """
         if cls is None:
-            objects = self.__session.query(State, City, User, Place, Review, Amenity).all()
+            if after is not None:
+                raise ValueError("keyset pagination needs a class")
+            if load:
+                raise ValueError("eager loading needs a class")
+            if order_by:
+                raise ValueError("sorting needs a class")
+            objects = self.iter()
+            if limit is not None or offset:
+                start = offset or 0
+                stop = None if limit is None else start + limit
+                objects = itertools.islice(objects, start, stop)
         else:
-            objects = self.__session.query(cls).all()
+            objects = self.__query(cls, limit, offset, after, order_by) \
+                .options(*self.__options(cls, load)).all()
 
         return {obj.__class__.__name__ + '.' + obj.id: obj for obj in objects}
 
+    def iter(self, cls=None, batch_size=1000):
+        """Yield the objects of cls, or of every class one after another
+
+        Rows are streamed from a server-side cursor batch_size at a time,
+        so memory stays flat however large the table is.
+        """
+        for c in classes.values() if cls is None else [cls]:
+            yield from self.__query(c).yield_per(batch_size)
+
+    def __query(self, cls, limit=None, offset=None, after=None,
+                order_by=None):
+        """Build the query for the objects of cls, paginated if asked"""
+        cls = classes[cls.__name__ if isinstance(cls, type) else cls]
+        query = self.__session.query(cls)
+        if order_by:
+            if after is not None:
+                raise ValueError("keyset pagination follows the id order")
+            column = getattr(cls, order_by.lstrip('-'))
+            query = query.order_by(
+                column.desc() if order_by.startswith('-') else column)
+        if after is not None:
+            query = query.filter(cls.id > after)
+        if after is not None or limit is not None or offset:
+            query = query.order_by(cls.id)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    @staticmethod
+    def __options(cls, load):
+        """Turn the relationships to load into loader options
+
+        A name loads a relationship of cls with one SELECT ... IN for all
+        the rows, whatever their number; 'cities.places' goes on through
+        the relationship of the related class. Loader options, such as
+        joinedload(State.cities), are passed through as they are.
+        """
+        options = []
+        for path in load or ():
+            if not isinstance(path, str):
+                options.append(path)
+                continue
+            option = None
+            model = classes[cls.__name__ if isinstance(cls, type) else cls]
+            for name in path.split('.'):
+                attr = getattr(model, name)
+                option = selectinload(attr) if option is None \
+                    else option.selectinload(attr)
+                model = attr.property.mapper.class_
+            options.append(option)
+        return options
+
+    def query(self, cls):
+        """Return a Query over the rows of cls, see models.engine.query
+
+        It runs as a single SELECT; with only() just those columns are
+        fetched and no object is built.
+        """
+        return Query(cls, self.__select)
+
+    def __select(self, query, count, stream=False, batch_size=1000):
+        """Run a Query, returning its results or their number
+
+        A stream yields the rows from a server-side cursor batch_size
+        at a time, as iter() does.
+        """
+        cls = classes[query.cls.__name__
+                      if isinstance(query.cls, type) else query.cls]
+        conditions = []
+        for field, op, value in query.filters:
+            column = getattr(cls, field)
+            if op == 'in':
+                conditions.append(column.in_(value))
+            else:
+                conditions.append(getattr(column, '__{}__'.format(op))(value))
+        if count:
+            return self.__session.query(func.count(cls.id)) \
+                .filter(*conditions).scalar()
+        if query.fields is None:
+            select = self.__session.query(cls)
+        else:
+            select = self.__session.query(
+                *(getattr(cls, field) for field in query.fields))
+        select = select.filter(*conditions)
+        for field in query.order:
+            column = getattr(cls, field.lstrip('-'))
+            select = select.order_by(
+                column.desc() if field.startswith('-') else column)
+        if query.skip:
+            select = select.offset(query.skip)
+        if query.take is not None:
+            select = select.limit(query.take)
+        if stream:
+            select = select.yield_per(batch_size)
+            if query.fields is None:
+                return select
+            return (row._asdict() for row in select)
+        if query.fields is None:
+            return select.all()
+        return [row._asdict() for row in select]
+
+    def search_places(self, **criteria):
+        """Return the places matching criteria, see models.engine.search
+
+        Prices, capacities, amenities and the box around the location
+        are filtered in SQL; the exact radius and distance order, which
+        need trigonometry, are checked on the rows that come back.
+        """
+        search.check_criteria(criteria)
+        query = self.__session.query(Place)
+        if criteria.get('price_min') is not None:
+            query = query.filter(Place.price_by_night >= criteria['price_min'])
+        if criteria.get('price_max') is not None:
+            query = query.filter(Place.price_by_night <= criteria['price_max'])
+        for name, attr in search.minimums.items():
+            if criteria.get(name) is not None:
+                query = query.filter(getattr(Place, attr) >= criteria[name])
+        amenities = set(criteria.get('amenities') or ())
+        if amenities:
+            having = select(place_amenity.c.place_id) \
+                .where(place_amenity.c.amenity_id.in_(amenities)) \
+                .group_by(place_amenity.c.place_id) \
+                .having(func.count() == len(amenities))
+            query = query.filter(Place.id.in_(having))
+        box = search.search_box(criteria)
+        if box is not None:
+            south, west, north, east = box
+            query = query.filter(Place.latitude.between(south, north))
+            if west <= east:
+                query = query.filter(Place.longitude.between(west, east))
+            else:
+                query = query.filter(or_(Place.longitude >= west,
+                                         Place.longitude <= east))
+        sort = criteria.get('sort', 'price')
+        query = query.order_by(Place.price_by_night.desc()
+                               if sort == '-price' else Place.price_by_night,
+                               Place.id)
+        if not criteria.get('near'):
+            # every filter ran in SQL, so can the page
+            if criteria.get('offset'):
+                query = query.offset(criteria['offset'])
+            if criteria.get('limit') is not None:
+                query = query.limit(criteria['limit'])
+            return query.all()
+        return search.finish([place for place in query
+                              if search.matches(place, criteria)], criteria)
+
+    def get(self, cls, id):
+        """Retrieve one object by primary key, or None"""
+        cls = classes.get(cls.__name__ if isinstance(cls, type) else cls)
+        if cls is None or id is None:
+            return None
+        return self.__session.get(cls, id)
+
+    def version(self, *model_classes):
+        """Return a counter per class that moves when its rows change
+
+        The counters live in the versions table and move in the same
+        transaction as the writes, so those of other processes count
+        too; one indexed read gets them all. Rows written with plain
+        SQL, outside storage, are not counted.
+        """
+        names = [classes[cls.__name__ if isinstance(cls, type) else cls]
+                 .__tablename__ for cls in model_classes]
+        rows = dict(self.__session.execute(
+            select(versions.c.name, versions.c.version)
+            .where(versions.c.name.in_(names))).all())
+        return tuple(rows.get(name, 0) for name in names)
+
+    def shared_version(self, versions):
+        """Return versions: the counters are the same in every process"""
+        return versions
+
+    def count(self, cls=None):
+        """Count all objects, or the objects of a specific class"""
+        if cls is None:
+            return sum(self.count(c) for c in classes.values())
+        cls = classes.get(cls.__name__ if isinstance(cls, type) else cls)
+        if cls is None:
+            return 0
+        return self.__session.query(func.count(cls.id)).scalar()
+
     def new(self, obj):
         """Add the object to the current database session"""
         self.__session.add(obj)
 
+    def changed(self, obj, attr):
+        """Nothing to do: the session tracks its objects itself"""
+
+    def bulk_new(self, objs, batch_size=1000):
+        """Insert every object of an iterable, returns how many were added
+
+        Rows go out as one executemany INSERT per class and batch, so the
+        objects are not tracked by the session; save() commits them.
+        """
+        count = 0
+        batch = []
+        for obj in objs:
+            batch.append(obj)
+            if len(batch) == batch_size:
+                count += self.__insert(batch)
+                batch = []
+        return count + self.__insert(batch)
+
+    def __insert(self, objs):
+        """Insert a batch of objects grouped by class"""
+        rows = {}
+        for obj in objs:
+            columns = obj.__table__.columns.keys()
+            rows.setdefault(type(obj), []).append(
+                {k: v for k, v in obj.__dict__.items()
+                 if k in columns and v is not None})
+        for cls, values in rows.items():
+            self.__session.execute(insert(cls), values)
+        bump_versions(self.__session, {cls.__tablename__ for cls in rows})
+        return len(objs)
+
     def save(self):
-        """Commit all changes of the current database session"""
+        """Commit all changes of the current database session
+
+        Within a transaction the changes are only flushed, so queries
+        see them, and wait for commit().
+        """
+        if self.__session.info.get('transaction'):
+            self.__session.flush()
+        else:
+            self.__session.commit()
+
+    def begin(self):
+        """Start a transaction in the session of the calling thread"""
+        if self.__session.info.get('transaction'):
+            raise ValueError("transaction already in progress")
         self.__session.commit()
+        self.__session.info['transaction'] = True
+
+    def commit(self):
+        """End the transaction, committing its changes"""
+        if not self.__session.info.pop('transaction', False):
+            raise ValueError("no transaction in progress")
+        self.__session.commit()
+
+    def rollback(self):
+        """End the transaction, dropping its changes"""
+        if not self.__session.info.pop('transaction', False):
+            raise ValueError("no transaction in progress")
+        self.__session.rollback()
 
     def delete(self, obj=None):
         """Delete obj from the current database session"""
@@ -55,11 +388,55 @@ class DBStorage:
             self.__session.delete(obj)
 
     def reload(self):
-        """Reload data from the database"""
-        Base.metadata.create_all(self.__engine)
-        session_factory = sessionmaker(bind=self.__engine, expire_on_commit=False)
-        self.__session = scoped_session(session_factory)
+        """Create the tables, then start the calling thread afresh
+
+        The session registry is built once, the sessions other threads
+        are using are left alone.
+        """
+        with self.__lock:
+            Base.metadata.create_all(self.__engine)
+            self.create_indexes()
+            self.__create_versions()
+            if self.__session is None:
+                session_factory = sessionmaker(bind=self.__engine,
+                                               expire_on_commit=False)
+                event.listen(session_factory, 'before_flush', count_changes)
+                self.__session = scoped_session(session_factory)
+        self.__session.remove()
+
+    def __create_versions(self):
+        """Add the missing rows of the versions table, at zero"""
+        names = {cls.__tablename__ for cls in classes.values()}
+        try:
+            with self.__engine.begin() as conn:
+                names -= set(conn.execute(select(versions.c.name)).scalars())
+                if names:
+                    conn.execute(insert(versions), [
+                        {'name': name, 'version': 0} for name in names])
+        except IntegrityError:
+            # another process added them meanwhile
+            pass
+
+    def create_indexes(self):
+        """Create the indexes the models declare but the tables lack
+
+        create_all() skips the tables that exist already, indexes
+        included, so databases made before an index was declared get
+        it here. Returns the names of the indexes created.
+        """
+        inspector = inspect(self.__engine)
+        created = []
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index['name']
+                        for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(self.__engine)
+                    created.append(index.name)
+        return created
 
     def close(self):
-        """Close the current session"""
+        """Close the session of the calling thread"""
         self.__session.remove()
@@ -1,6 +1,23 @@
 #!/usr/bin/python3
 """Defines the FileStorage class."""
+import atexit
+import contextlib
+import heapq
+import io
+import itertools
 import json
+import mmap
+import os
+import threading
+from models.base_model import BaseModel, epoch_time
+from models.engine.codec import JSONCodec, get_codec, iter_spans
+from models.engine.query import Query, matches, sort_key
+from models.engine.search import PlaceIndex
+from models.engine.records import Span, record_type
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 from models.user import User
 from models.place import Place
 from models.state import State
@@ -8,41 +25,845 @@ from models.city import City
 from models.amenity import Amenity
 from models.review import Review
 
+classes = {
+    'BaseModel': BaseModel, 'User': User, 'Place': Place,
+    'State': State, 'City': City, 'Amenity': Amenity, 'Review': Review
+}
+
+
 class FileStorage:
-    __file_path = 'file.json'
+    """Serializes instances to a JSON file and deserializes them back.
+
+    Objects are indexed by class and by their *_id foreign keys; the
+    indexes follow a stored object whose foreign key is set, see
+    changed().
+
+    With HBNB_FILE_JOURNAL=on, save() appends one record per changed
+    object to '<file>.journal' instead of rewriting the whole file, and
+    the journal is folded back into the snapshot once it outgrows it.
+
+    With HBNB_FILE_LAZY=on, reload() keeps each record in a compact
+    slot-backed Record and a class is only turned into model instances
+    the first time all(), iter() or related() asks for it; get() builds
+    just the one object.
+
+    HBNB_FILE_CODEC picks the snapshot format among those of
+    models.engine.codec, json by default; the file name follows it.
+
+    The snapshot is written to a temporary file that then replaces it,
+    so readers never see a partial file. HBNB_FILE_DURABILITY sets when
+    writes reach the disk: 'always' fsyncs on every save, 'group' once
+    per HBNB_FILE_SYNC_MS milliseconds (100 by default) for all the
+    saves in between, and 'none', the default, leaves it to the OS.
+
+    With HBNB_FILE_SHARED=on, several processes can use the same file:
+    every write holds an exclusive flock on '<file>.lock' and bumps the
+    generation counter kept in it, and close() only reloads when that
+    generation moved. Before writing, a process first catches up with
+    the other writers, then reapplies its own pending changes. Adding
+    HBNB_FILE_MMAP=on to lazy mode leaves the records of a json
+    snapshot in a shared read-only memory map until they are needed.
+
+    With HBNB_FILE_TIMESTAMPS=epoch, created_at and updated_at are
+    written as integer microseconds since the epoch; both encodings
+    are read back whatever the setting.
+
+    Every method holds one reentrant lock while it reads or changes the
+    objects and indexes, so threads of a web server can share storage.
+
+    Between begin() and commit(), save() writes nothing: the changes
+    stay pending until commit() writes them all at once, or rollback()
+    drops them and reads the objects back from the files. The objects
+    are shared by every thread, so one thread at a time may be in a
+    transaction: save() and begin() in other threads wait until it
+    ends, and rollback() drops every unsaved change, whichever thread
+    made it.
+    """
+    __codec = get_codec(os.getenv('HBNB_FILE_CODEC', 'json'))
+    __file_path = 'file' + __codec.extension
     __objects = {}
+    __raw = {}
+    __by_class = {}
+    __refs = {}
+    __ref_vals = {}
+    __ref_attrs = ('state_id', 'city_id', 'place_id', 'user_id')
+    __dirty = {}
+    __journal = os.getenv('HBNB_FILE_JOURNAL') == 'on'
+    __lazy = os.getenv('HBNB_FILE_LAZY') == 'on'
+    __epoch = os.getenv('HBNB_FILE_TIMESTAMPS') == 'epoch'
+    __shared = os.getenv('HBNB_FILE_SHARED') == 'on' and fcntl is not None
+    __mmap = os.getenv('HBNB_FILE_MMAP') == 'on'
+    __lock_file = None
+    __lock_pid = None
+    __generation = None
+    __journal_min = 1000
+    __journal_len = 0
+    __durability = os.getenv('HBNB_FILE_DURABILITY', 'none')
+    __sync_interval = int(os.getenv('HBNB_FILE_SYNC_MS', '100')) / 1000
+    __sync_lock = threading.Lock()
+    __sync_timer = None
+    __unsynced = set()
+    __saving = threading.Condition()
+    __writing = False
+    __save_requests = 0
+    __saves_done = 0
+    __lock = threading.RLock()
+    # the id of the thread in a transaction, and the condition notified
+    # when it ends
+    __transaction = None
+    __transaction_ended = threading.Condition(__lock)
+    __versions = {}
+    __place_index = None
+    __previous = None
+    __snapshot_stat = None
+    __journal_ino = None
+    __journal_end = 0
+
+    def all(self, cls=None, load=None, order_by=None):
+        """Returns the objects of cls, or every object
 
-    def all(self, cls=None):
-        if cls is None:
-            return self.__objects
+        Without a class this is the live dictionary of storage; threads
+        that may run alongside writers should use all(cls) or iter(),
+        which return copies taken under the lock. load is accepted for
+        DBStorage compatibility: related objects already come from the
+        foreign key indexes without any further read. order_by sorts
+        the objects of cls by that attribute, descending after a '-'.
+        """
+        with FileStorage.__lock:
+            if cls is None:
+                if order_by:
+                    raise ValueError("sorting needs a class")
+                self.__hydrate()
+                return self.__objects
+            cls_name = cls.__name__ if isinstance(cls, type) else cls
+            self.__hydrate(cls_name)
+            objects = self.__by_class.get(cls_name, {})
+            if not order_by:
+                return dict(objects)
+            objects = tuple(objects.values())
+        objects = sorted(objects, key=sort_key(order_by.lstrip('-')),
+                         reverse=order_by.startswith('-'))
+        return {cls_name + '.' + obj.id: obj for obj in objects}
+
+    def query(self, cls):
+        """Returns a Query over the objects of cls, see models.engine.query
+
+        An equality filter on id or on a *_id foreign key starts from
+        the matching objects of the indexes instead of the whole class.
+        """
+        return Query(cls, self.__select)
+
+    def __select(self, query, count, stream=False):
+        """Runs a Query, returning its results or their number
+
+        The objects are in memory already, so a stream is the list.
+        """
+        cls_name = query.cls.__name__ \
+            if isinstance(query.cls, type) else query.cls
+        filters = list(query.filters)
+        with FileStorage.__lock:
+            self.__hydrate(cls_name)
+            objects = None
+            for i, (field, op, value) in enumerate(filters):
+                if op != 'eq':
+                    continue
+                if field == 'id':
+                    obj = self.__by_class.get(cls_name, {}).get(
+                        cls_name + '.' + str(value))
+                    objects = (obj,) if obj is not None else ()
+                elif field in self.__ref_attrs:
+                    objects = tuple(self.__refs.get((cls_name, field), {})
+                                    .get(value, {}).values())
+                else:
+                    continue
+                del filters[i]
+                break
+            if objects is None:
+                objects = tuple(self.__by_class.get(cls_name, {}).values())
+        for field, op, value in filters:
+            objects = [obj for obj in objects
+                       if matches(getattr(obj, field, None), op, value)]
+        if count:
+            return len(objects)
+        stop = None if query.take is None else query.skip + query.take
+        if len(query.order) == 1 and stop is not None:
+            # a heap keeps the first rows without sorting them all
+            field = query.order[0]
+            pick = heapq.nlargest if field.startswith('-') \
+                else heapq.nsmallest
+            objects = pick(stop, objects, key=sort_key(field.lstrip('-')))
         else:
+            # successive stable sorts, the last one on the first field
+            for field in reversed(query.order):
+                objects = sorted(objects, key=sort_key(field.lstrip('-')),
+                                 reverse=field.startswith('-'))
+        objects = list(itertools.islice(objects, query.skip, stop))
+        if query.fields is None:
+            return objects
+        return [{field: getattr(obj, field, None) for field in query.fields}
+                for obj in objects]
+
+    def search_places(self, **criteria):
+        """Returns the places matching criteria, see models.engine.search
+
+        The indexes are built on the first search after places changed,
+        then serve every search until the next change.
+        """
+        with FileStorage.__lock:
+            self.__hydrate('Place')
+            version = self.__versions.get('Place', 0)
+            index = FileStorage.__place_index
+            if index is None or index[0] != version:
+                places = tuple(self.__by_class.get('Place', {}).values())
+        if index is None or index[0] != version:
+            index = (version, PlaceIndex(places))
+            with FileStorage.__lock:
+                if self.__versions.get('Place', 0) == version:
+                    FileStorage.__place_index = index
+        return index[1].search(**criteria)
+
+    def get(self, cls, id):
+        """Returns the object of class cls with that id, or None"""
+        cls_name = cls.__name__ if isinstance(cls, type) else cls
+        key = cls_name + '.' + str(id)
+        with FileStorage.__lock:
+            obj = self.__objects.get(key)
+            if obj is None and key in self.__raw.get(cls_name, {}):
+                record = self.__raw[cls_name].pop(key)
+                obj = classes[cls_name](**record.to_dict())
+                self.__put(key, obj)
+        return obj
+
+    def count(self, cls=None):
+        """Returns the number of objects, or of objects of one class"""
+        with FileStorage.__lock:
+            if cls is None:
+                return len(self.__objects) + \
+                    sum(len(records) for records in self.__raw.values())
             cls_name = cls.__name__ if isinstance(cls, type) else cls
-            return {k: v for k, v in self.__objects.items() if k.startswith(cls_name + '.')}
+            return len(self.__by_class.get(cls_name, {})) + \
+                len(self.__raw.get(cls_name, {}))
+
+    def iter(self, cls=None):
+        """Yields the objects of cls, or every object"""
+        with FileStorage.__lock:
+            if cls is None:
+                self.__hydrate()
+                objects = self.__objects
+            else:
+                cls_name = cls.__name__ if isinstance(cls, type) else cls
+                self.__hydrate(cls_name)
+                objects = self.__by_class.get(cls_name, {})
+            # a tuple of references so callers may modify storage meanwhile
+            objects = tuple(objects.values())
+        yield from objects
+
+    def related(self, cls, attr, value):
+        """Returns the objects of cls whose attribute attr equals value"""
+        cls_name = cls.__name__ if isinstance(cls, type) else cls
+        with FileStorage.__lock:
+            self.__hydrate(cls_name)
+            if attr not in self.__ref_attrs:
+                return [obj for obj in self.all(cls_name).values()
+                        if getattr(obj, attr, None) == value]
+            return list(self.__refs.get((cls_name, attr), {})
+                        .get(value, {}).values())
 
     def new(self, obj):
-        self.__objects["{}.{}".format(type(obj).__name__, obj.id)] = obj
+        key = "{}.{}".format(type(obj).__name__, obj.id)
+        with FileStorage.__lock:
+            self.__raw.get(type(obj).__name__, {}).pop(key, None)
+            self.__put(key, obj)
+            self.__touch(type(obj).__name__)
+            self.__dirty[key] = obj
+
+    def changed(self, obj, attr):
+        """Notes that attr of obj was set, see BaseModel.__setattr__
+
+        A stored object is then written by the next save(), to the
+        journal too, without going through new() again, and a new
+        foreign key moves it in the indexes at once.
+        """
+        key = '{}.{}'.format(type(obj).__name__, obj.__dict__.get('id'))
+        with FileStorage.__lock:
+            if self.__objects.get(key) is obj:
+                if attr in self.__ref_attrs:
+                    self.__put(key, obj)
+                self.__touch(key.partition('.')[0])
+                self.__dirty[key] = obj
+
+    def bulk_new(self, objs):
+        """Adds every object of an iterable, returns how many were added
+
+        Nothing is written until the next save(), which persists them
+        all in a single write.
+        """
+        count = 0
+        for obj in objs:
+            self.new(obj)
+            count += 1
+        return count
 
     def save(self):
-        with open(self.__file_path, 'w') as f:
-            json.dump({k: v.to_dict() for k, v in self.__objects.items()}, f)
+        """Persists the objects changed since the last save
+
+        Saves requested while another thread is writing wait for it,
+        then all of them are covered by a single write. Within a
+        transaction, nothing is written until commit(); a save from
+        another thread waits for the transaction to end.
+        """
+        if self.__wait_transaction():
+            return
+        with FileStorage.__saving:
+            FileStorage.__save_requests += 1
+            ticket = FileStorage.__save_requests
+            while FileStorage.__writing:
+                FileStorage.__saving.wait()
+            if FileStorage.__saves_done >= ticket:
+                return
+            FileStorage.__writing = True
+            covered = FileStorage.__save_requests
+        done = False
+        try:
+            self.__persist()
+            done = True
+        finally:
+            with FileStorage.__saving:
+                if done:
+                    FileStorage.__saves_done = covered
+                FileStorage.__writing = False
+                FileStorage.__saving.notify_all()
+
+    def __wait_transaction(self):
+        """Waits for a transaction of another thread to end, tells if
+        the calling thread is in one"""
+        me = threading.get_ident()
+        with FileStorage.__lock:
+            while FileStorage.__transaction not in (None, me):
+                FileStorage.__transaction_ended.wait()
+            return FileStorage.__transaction == me
+
+    def begin(self):
+        """Starts a transaction, after saving the changes made before
+
+        If another thread is in a transaction, waits for it to end.
+        """
+        while True:
+            if self.__wait_transaction():
+                raise ValueError("transaction already in progress")
+            self.save()
+            with FileStorage.__lock:
+                if FileStorage.__transaction is None:
+                    FileStorage.__transaction = threading.get_ident()
+                    return
+
+    def __end_transaction(self):
+        """Ends the transaction of the calling thread, if it has one"""
+        with FileStorage.__lock:
+            if FileStorage.__transaction != threading.get_ident():
+                raise ValueError("no transaction in progress")
+            FileStorage.__transaction = None
+            FileStorage.__transaction_ended.notify_all()
+
+    def commit(self):
+        """Ends the transaction, writing its changes in a single save"""
+        self.__end_transaction()
+        self.save()
+
+    def rollback(self):
+        """Ends the transaction, dropping its changes
+
+        Since begin() saved everything before, the files hold what the
+        objects were when the transaction started, so they are read
+        back from there.
+        """
+        with FileStorage.__lock:
+            self.__end_transaction()
+            self.__dirty.clear()
+            self.__reset()
+            self.reload()
+
+    def sync(self):
+        """Flushes to disk the files written since the last sync"""
+        with FileStorage.__sync_lock:
+            paths = FileStorage.__unsynced
+            FileStorage.__unsynced = set()
+            FileStorage.__sync_timer = None
+        for path in paths:
+            self.__fsync(path)
+
+    def __persist(self):
+        """Writes the pending changes, after catching up if shared"""
+        with FileStorage.__lock:
+            if not self.__shared:
+                self.__write()
+            else:
+                self.__persist_shared()
+
+    def __persist_shared(self):
+        """Writes under the lock file, then bumps its generation"""
+        with self.__locked(fcntl.LOCK_EX) as generation:
+            if generation != FileStorage.__generation:
+                self.__refresh()
+            self.__write()
+            FileStorage.__generation = generation + 1
+            f = FileStorage.__lock_file
+            f.seek(0)
+            f.truncate()
+            f.write(str(generation + 1).encode())
+            f.flush()
+
+    def __write(self):
+        """Writes the pending changes to the journal or the snapshot"""
+        if not self.__journal:
+            self.__write_snapshot()
+            self.__truncate_journal()
+        elif (FileStorage.__journal_len + len(self.__dirty) >
+                max(self.__journal_min, self.count()) or
+                not os.path.exists(self.__file_path)):
+            # the journal is written first so that a crash before the
+            # truncate replays to the same state as the new snapshot
+            self.__append_journal()
+            self.__write_snapshot()
+            self.__truncate_journal()
+        else:
+            self.__append_journal()
+        self.__dirty.clear()
 
     def reload(self):
+        """Loads the snapshot file, then replays the journal over it"""
+        with FileStorage.__lock:
+            if not self.__shared:
+                self.__read()
+                return
+            with self.__locked(fcntl.LOCK_SH) as generation:
+                self.__read()
+                FileStorage.__generation = generation
+
+    def __read(self):
+        """Loads the snapshot file, then replays the journal over it"""
+        FileStorage.__snapshot_stat = self.__stat(self.__file_path)
         try:
-            with open(self.__file_path, 'r') as f:
-                obj_dict = json.load(f)
-            for k, v in obj_dict.items():
-                cls_name = k.split('.')[0]
-                cls = globals()[cls_name]
-                self.__objects[k] = cls(**v)
+            if self.__lazy and self.__mmap and self.__codec is JSONCodec:
+                self.__map_snapshot()
+            else:
+                with open(self.__file_path,
+                          'rb' if self.__codec.binary else 'r') as f:
+                    for k, v in self.__codec.load(f):
+                        self.__load(k, v)
         except FileNotFoundError:
             pass
+        self.__replay_journal()
+
+    def __map_snapshot(self):
+        """Maps the snapshot and keeps a Span per record
+
+        The spans are scanned through the descriptor that was mapped,
+        so a snapshot another process puts in place meanwhile cannot
+        give offsets into the wrong file.
+        """
+        with open(self.__file_path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # latin-1 maps each byte to one character, so offsets match
+            text = io.TextIOWrapper(f, encoding='latin-1')
+            try:
+                for key, start, end in iter_spans(text):
+                    span = Span(buf, start, end)
+                    if not self.__keep(key, span):
+                        self.__stash(key, span)
+            finally:
+                text.detach()
 
     def delete(self, obj=None):
         if obj is not None:
             key = "{}.{}".format(type(obj).__name__, obj.id)
-            if key in self.__objects:
-                del self.__objects[key]
+            with FileStorage.__lock:
+                if key in self.__objects or \
+                        key in self.__raw.get(type(obj).__name__, {}):
+                    self.__drop(key)
+                    self.__dirty[key] = None
+
+    def version(self, *model_classes):
+        """Returns a counter per class that moves when its objects change
+
+        The files are checked first, as close() does, so changes made
+        by other processes count too.
+        """
+        with FileStorage.__lock:
+            self.__catch_up()
+            return tuple(
+                self.__versions.get(c.__name__ if isinstance(c, type) else c,
+                                    0) for c in model_classes)
+
+    def shared_version(self, versions):
+        """Returns what stands for versions in every process, or None
+
+        The counters of version() only mean something in this process.
+        In shared mode, with nothing left unsaved, the generation of
+        the lock file stands for all of them.
+        """
+        with FileStorage.__lock:
+            if not self.__shared or self.__dirty:
+                return None
+            return FileStorage.__generation
 
     def close(self):
-        """Call reload() method for deserializing the JSON file to objects"""
-        self.reload()
+        """Catches up with the files if they changed since the last load.
+
+        An unchanged snapshot with a grown journal only replays the new
+        journal records; anything else reads the files again, dropping
+        the objects deleted by other processes, see __refresh().
+        """
+        with FileStorage.__lock:
+            self.__catch_up()
+
+    def __catch_up(self):
+        """Does the work of close() once the lock is held"""
+        if self.__shared:
+            with self.__locked(fcntl.LOCK_SH) as generation:
+                if generation != FileStorage.__generation:
+                    self.__refresh()
+                    FileStorage.__generation = generation
+            return
+        if self.__stat(self.__file_path) == FileStorage.__snapshot_stat:
+            journal = self.__stat(self.__journal_path())
+            ino = journal[0] if journal else None
+            size = journal[1] if journal else 0
+            if ino == FileStorage.__journal_ino and \
+                    size == FileStorage.__journal_end:
+                return
+        self.__refresh()
+
+    def __refresh(self):
+        """Catches up with the files, keeping the unsaved changes
+
+        Unlike reload(), objects deleted on disk go away too.
+        """
+        if self.__stat(self.__file_path) == FileStorage.__snapshot_stat:
+            journal = self.__stat(self.__journal_path())
+            if (journal and journal[0] == FileStorage.__journal_ino and
+                    journal[1] >= FileStorage.__journal_end):
+                self.__replay_journal(FileStorage.__journal_end)
+                self.__reapply()
+                return
+        self.__reread()
+
+    def __reapply(self):
+        """Puts the unsaved changes back over what the files hold"""
+        for key, obj in self.__dirty.items():
+            if obj is None:
+                self.__drop(key)
+            else:
+                self.__raw.get(key.partition('.')[0], {}).pop(key, None)
+                self.__put(key, obj)
+
+    def __reread(self):
+        """Reads the files from scratch, keeping the unsaved changes
+
+        An object whose record did not change stays the instance it
+        was, without being built again, and only the classes with an
+        object added, removed or changed get a new version; a write to
+        one class leaves what was built from the others, like the place
+        index, in place.
+        """
+        before = dict(self.__objects)
+        for records in self.__raw.values():
+            before.update(records)
+        counts = {name: self.count(name) for name in classes}
+        versions = dict(self.__versions)
+        self.__reset()
+        self.__versions.update(versions)
+        FileStorage.__previous = before
+        try:
+            self.__read()
+        finally:
+            FileStorage.__previous = None
+        self.__reapply()
+        for name in classes:
+            if self.count(name) != counts[name]:
+                self.__touch(name)
+
+    def __keep(self, key, record):
+        """Keeps the object held before __reread() if record matches it
+
+        Returns whether it did. record is the dict read from disk, or a
+        Span of the mapped snapshot.
+        """
+        old = FileStorage.__previous.get(key) \
+            if FileStorage.__previous else None
+        if old is None:
+            return False
+        if key not in self.__dirty:
+            if isinstance(old, Span) and isinstance(record, Span):
+                same = old.buf[old.start:old.end] == \
+                    record.buf[record.start:record.end]
+            else:
+                same = (self.__record(old) if isinstance(old, BaseModel)
+                        else old.to_dict()) == \
+                    (record if isinstance(record, dict) else record.to_dict())
+            if not same:
+                return False
+        if isinstance(old, BaseModel):
+            self.__put(key, old)
+        else:
+            self.__raw.setdefault(key.partition('.')[0], {})[key] = old
+        return True
+
+    def __reset(self):
+        """Forgets every object and index, but not the unsaved changes"""
+        for store in (self.__objects, self.__raw, self.__by_class,
+                      self.__refs, self.__ref_vals):
+            store.clear()
+        for cls_name in classes:
+            self.__touch(cls_name)
+
+    def __touch(self, cls_name):
+        """Counts a change to the objects of a class"""
+        self.__versions[cls_name] = self.__versions.get(cls_name, 0) + 1
+
+    @contextlib.contextmanager
+    def __locked(self, mode):
+        """Holds the lock file in mode, yielding the generation in it"""
+        path = self.__file_path + '.lock'
+        while True:
+            if FileStorage.__lock_pid != os.getpid():
+                # a forked worker must not share the parent's open file,
+                # flock would then see both as the same owner
+                FileStorage.__lock_file = open(path, 'a+b')
+                FileStorage.__lock_pid = os.getpid()
+            f = FileStorage.__lock_file
+            fcntl.flock(f, mode)
+            # the lock file may have been removed or replaced meanwhile
+            current = self.__stat(path)
+            if current and current[0] == os.fstat(f.fileno()).st_ino:
+                break
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+            FileStorage.__lock_pid = None
+        try:
+            f.seek(0)
+            yield int(f.read() or 0)
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def __stat(path):
+        """Returns what identifies a version of the file, None if absent"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def __load(self, key, record):
+        """Stores a record read from disk, as an instance unless lazy"""
+        if self.__keep(key, record):
+            return
+        cls_name = key.partition('.')[0]
+        if not self.__lazy:
+            self.__put(key, classes[cls_name](**record))
+            self.__touch(cls_name)
+        else:
+            self.__stash(key, record_type(classes[cls_name]).from_dict(record))
+
+    def __stash(self, key, record):
+        """Keeps a Record or Span to hydrate later"""
+        if key in self.__objects:
+            self.__drop(key)
+        cls_name = key.partition('.')[0]
+        self.__touch(cls_name)
+        records = self.__raw.get(cls_name)
+        if records is None:
+            records = self.__raw[cls_name] = {}
+        records[key] = record
+
+    def __hydrate(self, cls_name=None):
+        """Turns the pending records of a class, or all, into instances"""
+        for name in [cls_name] if cls_name else list(self.__raw):
+            records = self.__raw.pop(name, None)
+            if records:
+                cls = classes[name]
+                for key, record in records.items():
+                    self.__put(key, cls(**record.to_dict()))
+
+    def __put(self, key, obj):
+        """Stores obj under key in __objects and its class index
+
+        The version of its class is left to the callers: turning a
+        record into its instance is no change.
+        """
+        self.__objects[key] = obj
+        cls_name = key.partition('.')[0]
+        index = self.__by_class.get(cls_name)
+        if index is None:
+            index = self.__by_class[cls_name] = {}
+        index[key] = obj
+        self.__unref(key)
+        values = {}
+        for attr in self.__ref_attrs:
+            value = getattr(obj, attr, None)
+            if value is not None:
+                values[attr] = value
+                self.__refs.setdefault((cls_name, attr), {}) \
+                    .setdefault(value, {})[key] = obj
+        if values:
+            self.__ref_vals[key] = values
+
+    def __drop(self, key):
+        """Removes key from __objects, the pending records and indexes"""
+        self.__touch(key.partition('.')[0])
+        self.__objects.pop(key, None)
+        self.__raw.get(key.partition('.')[0], {}).pop(key, None)
+        self.__by_class.get(key.partition('.')[0], {}).pop(key, None)
+        self.__unref(key)
+
+    def __unref(self, key):
+        """Removes key from the foreign key indexes it was filed under"""
+        values = self.__ref_vals.pop(key, None)
+        if not values:
+            return
+        cls_name = key.partition('.')[0]
+        for attr, value in values.items():
+            index = self.__refs[(cls_name, attr)]
+            index[value].pop(key, None)
+            if not index[value]:
+                del index[value]
+
+    def __journal_path(self):
+        """Returns the path of the journal kept next to the snapshot"""
+        return self.__file_path + '.journal'
+
+    def __record(self, obj):
+        """Returns the dict written to disk for obj"""
+        record = obj.to_dict()
+        if self.__epoch:
+            record['created_at'] = epoch_time(obj.created_at)
+            record['updated_at'] = epoch_time(obj.updated_at)
+        return record
+
+    def __write_snapshot(self):
+        """Rewrites the snapshot file with every object"""
+        items = itertools.chain(
+            ((k, self.__record(v)) for k, v in self.__objects.items()),
+            *(((k, v.to_dict()) for k, v in records.items())
+              for records in self.__raw.values()))
+        tmp = '{}.{}.tmp'.format(self.__file_path, os.getpid())
+        try:
+            with open(tmp, 'wb' if self.__codec.binary else 'w') as f:
+                self.__codec.dump(items, f)
+                if self.__durability == 'always':
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.__file_path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        FileStorage.__snapshot_stat = self.__stat(self.__file_path)
+        self.__flush(self.__file_path)
+
+    def __flush(self, path):
+        """Makes the last write to path durable as the level asks"""
+        if self.__durability == 'always':
+            self.__fsync(path)
+        elif self.__durability == 'group':
+            with FileStorage.__sync_lock:
+                FileStorage.__unsynced.add(path)
+                if FileStorage.__sync_timer is None:
+                    timer = threading.Timer(self.__sync_interval, self.sync)
+                    timer.daemon = True
+                    FileStorage.__sync_timer = timer
+                    timer.start()
+
+    @staticmethod
+    def __fsync(path):
+        """Flushes path and the directory entry naming it to disk"""
+        for target in (path, os.path.dirname(path) or '.'):
+            try:
+                fd = os.open(target, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def __append_journal(self):
+        """Appends one record per pending change to the journal"""
+        if not self.__dirty:
+            return
+        lines = []
+        for key, obj in self.__dirty.items():
+            if obj is None:
+                record = {'op': 'del', 'key': key}
+            else:
+                record = {'op': 'set', 'key': key,
+                          'obj': self.__record(obj)}
+            lines.append(json.dumps(record) + '\n')
+        in_sync = self.__journal_synced()
+        with open(self.__journal_path(), 'ab') as f:
+            f.write(''.join(lines).encode())
+            end = f.tell()
+        self.__flush(self.__journal_path())
+        FileStorage.__journal_len += len(lines)
+        if in_sync:
+            # otherwise close() replays the foreign records along with
+            # ours, which is harmless since records are idempotent
+            FileStorage.__journal_ino = self.__stat(self.__journal_path())[0]
+            FileStorage.__journal_end = end
+
+    def __journal_synced(self):
+        """Tells if every journal record on disk has been applied"""
+        journal = self.__stat(self.__journal_path())
+        if journal is None:
+            return FileStorage.__journal_ino is None
+        return (journal[0] == FileStorage.__journal_ino and
+                journal[1] == FileStorage.__journal_end)
+
+    def __truncate_journal(self):
+        """Drops the journal once its records are in the snapshot"""
+        if FileStorage.__journal_len:
+            try:
+                os.remove(self.__journal_path())
+            except FileNotFoundError:
+                pass
+            FileStorage.__journal_len = 0
+        FileStorage.__journal_ino = None
+        FileStorage.__journal_end = 0
+
+    def __replay_journal(self, start=0):
+        """Applies the journal records from byte offset start onwards"""
+        count = 0
+        end = start
+        ino = None
+        try:
+            with open(self.__journal_path(), 'rb+') as f:
+                ino = os.fstat(f.fileno()).st_ino
+                f.seek(start)
+                for line in iter(f.readline, b''):
+                    if not line.endswith(b'\n'):
+                        # an interrupted append; cut it so the next
+                        # record does not get glued onto it
+                        f.seek(end)
+                        f.truncate()
+                        break
+                    record = json.loads(line)
+                    key = record['key']
+                    if record['op'] == 'del':
+                        self.__drop(key)
+                    else:
+                        self.__load(key, record['obj'])
+                    count += 1
+                    end += len(line)
+        except FileNotFoundError:
+            pass
+        FileStorage.__journal_len = count if start == 0 else \
+            FileStorage.__journal_len + count
+        FileStorage.__journal_ino = ino
+        FileStorage.__journal_end = end
+
+
+# group commits still pending when the interpreter exits
+atexit.register(FileStorage().sync)
@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+"""Connection pool and query metrics, idle-only pre-ping for DBStorage"""
+import threading
+import time
+from sqlalchemy import event, exc
+
+
+class PoolMonitor:
+    """Counts what the pool of an engine does and pings idle connections
+
+    A connection checked out again within ping_idle seconds of its
+    checkin is trusted as is; one that sat longer in the pool, where
+    the server may have dropped it, gets a SELECT 1 first. A failed
+    ping makes the pool replace the connection and try again.
+    ping_idle None never pings, 0 pings on every checkout.
+
+    Every statement the engine runs is counted in 'queries', which
+    tests compare before and after a page to catch N+1 queries.
+    """
+
+    def __init__(self, engine, ping_idle=None):
+        """Hooks the events of the pool of engine"""
+        self.pool = engine.pool
+        self.ping_idle = ping_idle
+        self.__lock = threading.Lock()
+        self.__counts = dict.fromkeys(
+            ('connects', 'checkouts', 'checkins', 'invalidations',
+             'pings', 'ping_failures', 'queries'), 0)
+        self.__wait_total = 0.0
+        self.__wait_max = 0.0
+        self.__overflow_max = 0
+        event.listen(self.pool, 'connect', self.__on_connect)
+        event.listen(self.pool, 'checkout', self.__on_checkout)
+        event.listen(self.pool, 'checkin', self.__on_checkin)
+        event.listen(self.pool, 'invalidate', self.__on_invalidate)
+        event.listen(self.pool, 'soft_invalidate', self.__on_invalidate)
+        event.listen(engine, 'before_cursor_execute', self.__on_execute)
+        # the pool has no event before a checkout starts waiting
+        connect = self.pool.connect
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                self.__waited(time.perf_counter() - start)
+        self.pool.connect = timed_connect
+
+    def stats(self):
+        """Returns the counters and the current state of the pool
+
+        wait_total and wait_max are in seconds and include the time
+        taken by new connections and pings.
+        """
+        with self.__lock:
+            stats = dict(self.__counts)
+            stats['wait_total'] = self.__wait_total
+            stats['wait_max'] = self.__wait_max
+            stats['overflow_max'] = self.__overflow_max
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            method = getattr(self.pool, name, None)
+            if method is not None:
+                stats[name] = method()
+        return stats
+
+    def reset(self):
+        """Sets every counter back to zero"""
+        with self.__lock:
+            for name in self.__counts:
+                self.__counts[name] = 0
+            self.__wait_total = self.__wait_max = 0.0
+            self.__overflow_max = 0
+
+    def __count(self, name):
+        with self.__lock:
+            self.__counts[name] += 1
+
+    def __waited(self, seconds):
+        overflow = getattr(self.pool, 'overflow', None)
+        with self.__lock:
+            self.__wait_total += seconds
+            self.__wait_max = max(self.__wait_max, seconds)
+            if overflow is not None:
+                self.__overflow_max = max(self.__overflow_max, overflow())
+
+    def __on_connect(self, dbapi_connection, record):
+        self.__count('connects')
+        record.info['checkin'] = time.monotonic()
+
+    def __on_checkout(self, dbapi_connection, record, proxy):
+        self.__count('checkouts')
+        checkin = record.info.get('checkin')
+        if (self.ping_idle is None or checkin is None or
+                time.monotonic() - checkin < self.ping_idle):
+            return
+        self.__count('pings')
+        try:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except Exception as e:
+            self.__count('ping_failures')
+            raise exc.DisconnectionError() from e
+
+    def __on_checkin(self, dbapi_connection, record):
+        self.__count('checkins')
+        record.info['checkin'] = time.monotonic()
+
+    def __on_invalidate(self, dbapi_connection, record, exception):
+        self.__count('invalidations')
+
+    def __on_execute(self, conn, cursor, statement, parameters, context,
+                     executemany):
+        self.__count('queries')
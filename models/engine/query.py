@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+"""Chainable queries over the objects of one class, run by a storage"""
+import operator
+
+operators = {
+    'eq': operator.eq, 'ne': operator.ne,
+    'lt': operator.lt, 'le': operator.le,
+    'gt': operator.gt, 'ge': operator.ge,
+    'in': lambda value, values: value in values,
+}
+
+
+def parse_filter(name):
+    """Splits 'price_by_night__le' into ('price_by_night', 'le')"""
+    field, sep, op = name.rpartition('__')
+    if not sep or op not in operators:
+        return name, 'eq'
+    return field, op
+
+
+def matches(value, op, expected):
+    """Tells if a field value passes a filter, a missing one only = None"""
+    if value is None and op not in ('eq', 'ne'):
+        return False
+    return operators[op](value, expected)
+
+
+def sort_key(field):
+    """Returns the sort key of objects by field, missing values last"""
+    def key(obj):
+        value = getattr(obj, field, None)
+        return (value is None, value)
+    return key
+
+
+class Query:
+    """A query built step by step, then run by the storage that made it
+
+    storage.query(State).filter(name='Texas').order_by('-name')
+    .limit(10).only('id', 'name').all()
+
+    filter() takes field=value for equality; a suffix among __ne,
+    __lt, __le, __gt, __ge and __in compares otherwise, e.g.
+    price_by_night__le=100 or id__in=ids. Each step returns a new
+    query, so a query can be the base of several others.
+
+    all() returns the objects, or with only() a dict per object with
+    just those fields. run(query, count, stream) does the work: it
+    returns the list of results, or their number when count is true;
+    iterating a query asks for a stream, which a storage may yield
+    from a cursor instead of building the list.
+    """
+
+    def __init__(self, cls, run):
+        """Starts a query over every object of cls"""
+        self.cls = cls
+        self.run = run
+        self.filters = []
+        self.order = []
+        self.skip = 0
+        self.take = None
+        self.fields = None
+
+    def __copy(self, **changes):
+        query = Query.__new__(Query)
+        query.__dict__.update(self.__dict__, **changes)
+        return query
+
+    def filter(self, **kwargs):
+        """Keeps the objects whose fields match every condition"""
+        return self.__copy(filters=self.filters + [
+            parse_filter(name) + (value,) for name, value in kwargs.items()])
+
+    def order_by(self, *fields):
+        """Sorts by the fields, descending for those after a '-'"""
+        return self.__copy(order=self.order + list(fields))
+
+    def limit(self, count):
+        """Keeps at most count objects"""
+        return self.__copy(take=count)
+
+    def offset(self, count):
+        """Skips the first count objects"""
+        return self.__copy(skip=count)
+
+    def only(self, *fields):
+        """Returns dicts of just those fields instead of the objects"""
+        return self.__copy(fields=fields)
+
+    def all(self):
+        """Returns the list of results"""
+        return self.run(self, False)
+
+    def first(self):
+        """Returns the first result, or None"""
+        results = self.limit(1).all()
+        return results[0] if results else None
+
+    def count(self):
+        """Returns the number of objects matching the filters"""
+        return self.run(self, True)
+
+    def __iter__(self):
+        return iter(self.run(self, False, True))
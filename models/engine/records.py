@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+"""Compact, slot-backed records for objects that are not hydrated yet"""
+import json
+import sys
+
+_types = {}
+_missing = object()
+
+
+class Record:
+    """A record read from disk, with one slot per column of its model
+
+    Attributes that are not columns are kept in the _extra dict, which
+    stays None for the usual record that has none.
+    """
+    __slots__ = ('_extra',)
+    _fields = ()
+    _columns = frozenset()
+    _interned = frozenset()
+    _model = None
+
+    @classmethod
+    def from_dict(cls, d):
+        """Builds a record from the dict read from disk"""
+        record = cls()
+        extra = None
+        for k, v in d.items():
+            if k in cls._columns:
+                if k in cls._interned and type(v) is str:
+                    v = sys.intern(v)
+                setattr(record, k, v)
+            elif k != '__class__':
+                if extra is None:
+                    extra = {}
+                extra[k] = v
+        record._extra = extra
+        return record
+
+    def to_dict(self):
+        """Returns the dict the record was built from"""
+        d = {}
+        for k in self._fields:
+            v = getattr(self, k, _missing)
+            if v is not _missing:
+                d[k] = v
+        if self._extra:
+            d.update(self._extra)
+        d['__class__'] = self._model
+        return d
+
+
+class Span:
+    """A record left in a memory-mapped snapshot until it is needed
+
+    The mapped pages live in the page cache, shared by every process
+    that maps the same snapshot.
+    """
+    __slots__ = ('buf', 'start', 'end')
+
+    def __init__(self, buf, start, end):
+        """Points at bytes start to end of buf"""
+        self.buf = buf
+        self.start = start
+        self.end = end
+
+    def to_dict(self):
+        """Decodes the record"""
+        return json.loads(self.buf[self.start:self.end])
+
+
+def record_type(model):
+    """Returns the Record subclass generated for a model class"""
+    rtype = _types.get(model)
+    if rtype is None:
+        table = getattr(model, '__table__', None)
+        if table is None:
+            fields = ('id', 'created_at', 'updated_at')
+            interned = frozenset()
+        else:
+            fields = tuple(c.key for c in table.columns)
+            # foreign keys repeat across records, so share the strings
+            interned = frozenset(c.key for c in table.columns
+                                 if c.foreign_keys)
+        rtype = _types[model] = type(model.__name__ + 'Record', (Record,), {
+            '__slots__': fields, '_fields': fields,
+            '_columns': frozenset(fields), '_interned': interned,
+            '_model': model.__name__})
+    return rtype
@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+"""Place search by price, capacity, amenities and location
+
+Both storage engines answer search_places(**criteria) with these
+criteria, all optional:
+
+    price_min, price_max  price_by_night range, bounds included
+    guests                at least that max_guest
+    rooms, bathrooms      at least that number_rooms, number_bathrooms
+    amenities             ids of amenities the place must all have
+    bbox                  (south, west, north, east) in degrees
+    near                  (latitude, longitude, radius in km)
+    sort                  'price' (the default), '-price' or 'distance'
+    offset, limit         the page of results
+
+parse_criteria() reads them from the strings of a URL or console line.
+"""
+import bisect
+import math
+
+EARTH_RADIUS = 6371.0
+fields = {
+    'price_min': int, 'price_max': int, 'guests': int,
+    'rooms': int, 'bathrooms': int, 'offset': int, 'limit': int,
+}
+minimums = {
+    'guests': 'max_guest', 'rooms': 'number_rooms',
+    'bathrooms': 'number_bathrooms',
+}
+sorts = ('price', '-price', 'distance')
+
+
+def parse_criteria(params):
+    """Turns a dict of strings into search criteria, or raises ValueError
+
+    amenities are comma separated ids, bbox 'south,west,north,east'
+    and near 'latitude,longitude,km'.
+    """
+    criteria = {}
+    for name, value in params.items():
+        if value in ('', None):
+            continue
+        if name in fields:
+            criteria[name] = fields[name](value)
+        elif name == 'amenities':
+            criteria[name] = [i for i in value.split(',') if i]
+        elif name in ('bbox', 'near'):
+            numbers = tuple(float(v) for v in value.split(','))
+            if len(numbers) != (4 if name == 'bbox' else 3):
+                raise ValueError("bad {}: {}".format(name, value))
+            criteria[name] = numbers
+        elif name == 'sort':
+            criteria[name] = value
+        else:
+            raise ValueError("unknown criterion: {}".format(name))
+    check_criteria(criteria)
+    return criteria
+
+
+def check_criteria(criteria):
+    """Raises ValueError for criteria that cannot be searched"""
+    unknown = set(criteria) - set(fields) - \
+        {'amenities', 'bbox', 'near', 'sort'}
+    if unknown:
+        raise ValueError("unknown criterion: {}".format(unknown.pop()))
+    sort = criteria.get('sort', 'price')
+    if sort not in sorts:
+        raise ValueError("unknown sort: {}".format(sort))
+    if sort == 'distance' and not criteria.get('near'):
+        raise ValueError("sorting by distance needs near")
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """Returns the great circle distance in km between two points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, km):
+    """Returns the (south, west, north, east) box around a circle"""
+    dlat = math.degrees(km / EARTH_RADIUS)
+    cos = math.cos(math.radians(lat))
+    if abs(lat) + dlat >= 90 or cos < 1e-9:
+        return (max(-90.0, lat - dlat), -180.0, min(90.0, lat + dlat), 180.0)
+    dlon = math.degrees(km / EARTH_RADIUS / cos)
+    if dlon >= 180:
+        return (lat - dlat, -180.0, lat + dlat, 180.0)
+    west, east = lon - dlon, lon + dlon
+    # past the 180th meridian the box wraps around, west > east
+    if west < -180:
+        west += 360
+    if east > 180:
+        east -= 360
+    return (lat - dlat, west, lat + dlat, east)
+
+
+def search_box(criteria):
+    """Returns the box bbox and near both fit in, or None"""
+    boxes = []
+    if criteria.get('bbox'):
+        boxes.append(criteria['bbox'])
+    if criteria.get('near'):
+        boxes.append(bounding_box(*criteria['near']))
+    if not boxes:
+        return None
+    if any(b[1] > b[3] for b in boxes):
+        # intersecting wrapped boxes is not worth it, one is enough
+        return boxes[0]
+    return (max(b[0] for b in boxes), max(b[1] for b in boxes),
+            min(b[2] for b in boxes), min(b[3] for b in boxes))
+
+
+def in_box(box, lat, lon):
+    """Tells if a point is inside a (south, west, north, east) box
+
+    A box whose west is east of its east crosses the 180th meridian.
+    """
+    if lat is None or lon is None or not box[0] <= lat <= box[2]:
+        return False
+    if box[1] <= box[3]:
+        return box[1] <= lon <= box[3]
+    return lon >= box[1] or lon <= box[3]
+
+
+def matches(place, criteria):
+    """Tells if a place passes the capacity and location criteria"""
+    for name, attr in minimums.items():
+        if criteria.get(name) is not None and \
+                (getattr(place, attr, None) or 0) < criteria[name]:
+            return False
+    if criteria.get('bbox') and \
+            not in_box(criteria['bbox'], place.latitude, place.longitude):
+        return False
+    near = criteria.get('near')
+    if near:
+        if place.latitude is None or place.longitude is None or \
+                distance(near[0], near[1],
+                         place.latitude, place.longitude) > near[2]:
+            return False
+    return True
+
+
+def finish(places, criteria):
+    """Sorts by distance if asked, then keeps the page of results"""
+    if criteria.get('sort') == 'distance':
+        lat, lon = criteria['near'][:2]
+        places = sorted(places, key=lambda p: distance(
+            lat, lon, p.latitude, p.longitude))
+    start = criteria.get('offset') or 0
+    stop = None if criteria.get('limit') is None \
+        else start + criteria['limit']
+    return places[start:stop]
+
+
+class GridIndex:
+    """Buckets points into square cells of a few degrees
+
+    A box search only looks at the points of the cells it overlaps.
+    """
+
+    def __init__(self, cell=0.5):
+        """Starts an empty grid of cell x cell degree squares"""
+        self.cell = cell
+        self.cells = {}
+
+    def __key(self, lat, lon):
+        return (int(math.floor(lat / self.cell)),
+                int(math.floor(lon / self.cell)))
+
+    def add(self, lat, lon, value):
+        """Files value at a point"""
+        self.cells.setdefault(self.__key(lat, lon), []).append(value)
+
+    def search(self, box):
+        """Returns the values of the cells the box overlaps
+
+        Points near the box but outside it come along; the caller
+        checks the exact position.
+        """
+        south, west, north, east = box
+        if west > east:
+            return self.search((south, west, north, 180.0)) + \
+                self.search((south, -180.0, north, east))
+        (i0, j0), (i1, j1) = self.__key(south, west), self.__key(north, east)
+        found = []
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.cells):
+            # a box wider than the populated cells: walk those instead
+            for (i, j), values in self.cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    found.extend(values)
+            return found
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                found.extend(self.cells.get((i, j), ()))
+        return found
+
+
+class PlaceIndex:
+    """In-memory indexes to search a snapshot of places
+
+    Places are kept sorted by price, then id as DBStorage breaks the
+    ties, so a price range is a slice found by bisection and the
+    results come out in price order. A grid
+    covers locations and an inverted index maps each amenity to the
+    positions of the places that have it.
+    """
+
+    def __init__(self, places, cell=0.5):
+        """Indexes the places"""
+        self.places = sorted(places, key=lambda p: (p.price_by_night or 0,
+                                                    p.id))
+        self.prices = [p.price_by_night or 0 for p in self.places]
+        self.grid = GridIndex(cell)
+        self.amenities = {}
+        for pos, place in enumerate(self.places):
+            if place.latitude is not None and place.longitude is not None:
+                self.grid.add(place.latitude, place.longitude, pos)
+            for amenity_id in getattr(place, 'amenity_ids', None) or ():
+                self.amenities.setdefault(amenity_id, set()).add(pos)
+
+    def search(self, **criteria):
+        """Returns the places matching the criteria, see the module"""
+        check_criteria(criteria)
+        lo, hi = 0, len(self.places)
+        if criteria.get('price_min') is not None:
+            lo = bisect.bisect_left(self.prices, criteria['price_min'])
+        if criteria.get('price_max') is not None:
+            hi = bisect.bisect_right(self.prices, criteria['price_max'])
+        candidates = None
+        for amenity_id in criteria.get('amenities') or ():
+            positions = self.amenities.get(amenity_id, set())
+            candidates = positions if candidates is None \
+                else candidates & positions
+        box = search_box(criteria)
+        if box is not None:
+            positions = set(self.grid.search(box))
+            candidates = positions if candidates is None \
+                else candidates & positions
+        if candidates is None:
+            positions = range(lo, hi)
+        else:
+            positions = sorted(p for p in candidates if lo <= p < hi)
+        if criteria.get('sort') == '-price':
+            positions = self.__descending(positions)
+        wanted = None
+        if criteria.get('sort') != 'distance' and \
+                criteria.get('limit') is not None:
+            # in price order already, so stop once the page is full
+            wanted = (criteria.get('offset') or 0) + criteria['limit']
+        found = []
+        for pos in positions:
+            place = self.places[pos]
+            if matches(place, criteria):
+                found.append(place)
+                if wanted is not None and len(found) == wanted:
+                    break
+        return finish(found, criteria)
+
+    def __descending(self, positions):
+        """Yields positions from the highest price down, keeping the
+        places of one price in id order, as DBStorage sorts them"""
+        end = len(positions)
+        while end:
+            start = end - 1
+            price = self.prices[positions[start]]
+            while start and self.prices[positions[start - 1]] == price:
+                start -= 1
+            for i in range(start, end):
+                yield positions[i]
+            end = start
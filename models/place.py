@@ -2,7 +2,7 @@
 """ Place Module for HBNB project """
 
 from models.base_model import BaseModel, Base
-from sqlalchemy import Column, String, Integer, ForeignKey, Float, Table, MetaData
+from sqlalchemy import Column, String, Integer, ForeignKey, Float, Table, MetaData, Index
 from sqlalchemy.orm import relationship
 from models.review import Review
 from os import getenv
@@ -12,28 +12,31 @@ metadata = Base.metadata
 place_amenity = Table(
     'place_amenity', metadata,
     Column('place_id', String(60), ForeignKey('places.id'), primary_key=True, nullable=False),
-    Column('amenity_id', String(60), ForeignKey('amenities.id'), primary_key=True, nullable=False)
+    Column('amenity_id', String(60), ForeignKey('amenities.id'), primary_key=True, nullable=False),
+    # the primary key already serves lookups by place_id
+    Index('ix_place_amenity_amenity_id', 'amenity_id')
 )
 
 
 class Place(BaseModel, Base):
     """ A place to stay """
     __tablename__ = 'places'
-    city_id = Column(String(60), ForeignKey('cities.id'), nullable=False)
-    user_id = Column(String(60), ForeignKey('users.id'), nullable=False)
+    # for the location box of searches
+    __table_args__ = (Index('ix_places_latitude_longitude', 'latitude', 'longitude'),)
+    city_id = Column(String(60), ForeignKey('cities.id'), nullable=False, index=True)
+    user_id = Column(String(60), ForeignKey('users.id'), nullable=False, index=True)
     name = Column(String(128), nullable=False)
     description = Column(String(1024), nullable=True)
     number_rooms = Column(Integer, nullable=False, default=0)
     number_bathrooms = Column(Integer, nullable=False, default=0)
     max_guest = Column(Integer, nullable=False, default=0)
-    price_by_night = Column(Integer, nullable=False, default=0)
+    price_by_night = Column(Integer, nullable=False, default=0, index=True)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
 
-    user = relationship("User", back_populates="places")
-    city = relationship("City", back_populates="places")
-
     if getenv('HBNB_TYPE_STORAGE') == 'db':
+        user = relationship("User", back_populates="places")
+        city = relationship("City", back_populates="places")
         reviews = relationship('Review', backref='place', cascade='all, delete, delete-orphan')
         amenities = relationship(
         'Amenity',
@@ -42,11 +45,13 @@ class Place(BaseModel, Base):
         overlaps="place_amenities"
     )
     else:
+        amenity_ids = []
+
         @property
         def reviews(self):
             """Returns the list of Review instances with place_id equals to the current Place.id"""
             from models import storage
-            return [review for review in storage.all(Review).values() if review.place_id == self.id]
+            return storage.related(Review, 'place_id', self.id)
         @property
         def amenities(self):
             """Getter attribute amenities that returns the list of Amenity instances based on the attribute amenity_ids"""
@@ -62,6 +67,7 @@ class Place(BaseModel, Base):
         @amenities.setter
         def amenities(self, obj):
             """Setter attribute amenities that handles append method for adding an Amenity.id"""
+            from models.amenity import Amenity
             if isinstance(obj, Amenity):
                 if obj.id not in self.amenity_ids:
-                    self.amenity_ids.append(obj.id)
+                    self.amenity_ids = self.amenity_ids + [obj.id]
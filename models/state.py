@@ -10,5 +10,20 @@ from models.base_model import Base
 class State(BaseModel, Base):
     """ State class """
     __tablename__ = 'states'
-    name = Column(String(128), nullable=False)
-    cities = relationship('City', cascade='all, delete-orphan', backref='state')
+    name = Column(String(128), nullable=False, index=True)
+
+    if getenv('HBNB_TYPE_STORAGE') == 'db':
+        cities = relationship('City', cascade='all, delete-orphan', backref='state',
+                              order_by='City.name')
+    else:
+        @property
+        def cities(self):
+            """Returns the list of City instances with state_id equals to the current State.id
+
+            They are sorted by name, as the relationship is in db mode.
+            """
+            from models import storage
+            from models.city import City
+            from models.engine.query import sort_key
+            return sorted(storage.related(City, 'state_id', self.id),
+                          key=sort_key('name'))
@@ -3,6 +3,7 @@
 from sqlalchemy import Column, String
 from models.base_model import BaseModel, Base
 from sqlalchemy.orm import relationship
+from os import getenv
 
 
 class User(BaseModel, Base):
@@ -15,5 +16,20 @@ class User(BaseModel, Base):
     first_name = Column(String(128), nullable=True)
     last_name = Column(String(128), nullable=True)
 
-    places = relationship("Place", back_populates="user", cascade="all, delete-orphan")
-    reviews = relationship('Review', backref='user', cascade='all, delete, delete-orphan')
+    if getenv('HBNB_TYPE_STORAGE') == 'db':
+        places = relationship("Place", back_populates="user", cascade="all, delete-orphan")
+        reviews = relationship('Review', backref='user', cascade='all, delete, delete-orphan')
+    else:
+        @property
+        def places(self):
+            """Returns the list of Place instances with user_id equals to the current User.id"""
+            from models import storage
+            from models.place import Place
+            return storage.related(Place, 'user_id', self.id)
+
+        @property
+        def reviews(self):
+            """Returns the list of Review instances with user_id equals to the current User.id"""
+            from models import storage
+            from models.review import Review
+            return storage.related(Review, 'user_id', self.id)
@@ -0,0 +1,344 @@
+#!/usr/bin/python3
+""" Module for testing the console """
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+import console
+from console import HBNBCommand
+from models import storage
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.state import State
+from tests.test_models.test_engine.test_file_storage import clear_storage
+
+
+def run(*lines):
+    """ Runs lines through the console, returns what it printed """
+    console = HBNBCommand()
+    out = io.StringIO()
+    with redirect_stdout(out):
+        for line in lines:
+            console.onecmd(console.precmd(line))
+    return out.getvalue()
+
+
+@unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') == 'db', 'file storage')
+class test_consoleImport(unittest.TestCase):
+    """ Class to test the import command """
+
+    def setUp(self):
+        """ Empty storage """
+        clear_storage()
+
+    def tearDown(self):
+        """ Empty storage and remove the files """
+        clear_storage()
+        for path in ('file.json', 'states.jsonl'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def write(self, *lines):
+        """ Writes the lines to states.jsonl """
+        with open('states.jsonl', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def test_import(self):
+        """ Each line becomes an object, saved at once """
+        self.write('{"name": "A"}', '', '{"name": "B"}')
+        self.assertEqual(run('import State states.jsonl'), '2\n')
+        clear_storage()
+        storage.reload()
+        self.assertEqual(sorted(s.name for s in storage.iter(State)),
+                         ['A', 'B'])
+
+    def test_invalid_record(self):
+        """ A bad line leaves nothing behind for the next save """
+        self.write('{"name": "A"}', '{"name": "B"}', '{"name": ')
+        self.assertEqual(run('import State states.jsonl'),
+                         '** invalid record **\n')
+        run('create City name="Napa"')
+        clear_storage()
+        storage.reload()
+        self.assertEqual(storage.count(State), 0)
+
+    def test_streamed(self):
+        """ bulk_new gets the records one by one, not a list of them """
+        calls = []
+        bulk_new = storage.bulk_new
+
+        def spy(objs):
+            calls.append(objs)
+            return bulk_new(objs)
+        self.write('{"name": "A"}', '{"name": "B"}')
+        with mock.patch.object(storage, 'bulk_new', spy):
+            self.assertEqual(run('import State states.jsonl'), '2\n')
+        self.assertNotIsInstance(calls[0], (list, tuple))
+        self.assertEqual(storage.count(State), 2)
+
+    def test_in_transaction(self):
+        """ Within a transaction the import is one of its changes, and
+        a bad line rolls the whole transaction back """
+        self.write('{"name": "A"}')
+        self.assertEqual(run('begin', 'import State states.jsonl',
+                             'rollback'), '1\n')
+        self.assertEqual(storage.count(State), 0)
+        self.write('{"name": "A"}', 'nope')
+        out = run('begin', 'create City name="Napa"',
+                  'import State states.jsonl', 'commit')
+        self.assertTrue(out.endswith('** invalid record **\n'
+                                     '** no transaction in progress **\n'))
+        self.assertEqual(storage.count(), 0)
+
+    def test_errors(self):
+        """ Missing arguments and files """
+        self.assertEqual(run('import'), '** class name missing **\n')
+        self.assertEqual(run('import Foo x'), "** class doesn't exist **\n")
+        self.assertEqual(run('import State'), '** file name missing **\n')
+        self.assertEqual(run('import State nowhere.jsonl'),
+                         "** file doesn't exist **\n")
+
+
+class test_consoleDotCommands(unittest.TestCase):
+    """ Class to test <class>.<command>(<args>) lines """
+
+    def precmd(self, line):
+        """ Returns the command line precmd makes of line """
+        return HBNBCommand().precmd(line)
+
+    def test_tokenizer(self):
+        """ Ids quoted either way or bare, and empty argument lists """
+        for line in ('Place.show("42")', "Place.show('42')",
+                     'Place.show(42)', 'Place.show( "42" , )'):
+            self.assertEqual(self.precmd(line), 'show Place 42')
+        self.assertEqual(self.precmd('Place.all()'), 'all Place')
+        self.assertEqual(self.precmd('Place.count( )'), 'count Place')
+        self.assertEqual(self.precmd('Place.destroy("")'), 'destroy Place')
+        self.assertEqual(self.precmd('Place.update("42", "name", "Loft")'),
+                         'update Place 42 name Loft')
+        self.assertEqual(self.precmd("Place.update(42, 'name', Loft)"),
+                         'update Place 42 name Loft')
+
+    def test_quoting(self):
+        """ Only values shlex.split would break are quoted """
+        self.assertEqual(self.precmd('Place.update("42", "name", "a, b")'),
+                         "update Place 42 name 'a, b'")
+        self.assertEqual(self.precmd('Place.update("42", "name", "it\'s")'),
+                         'update Place 42 name \'it\'"\'"\'s\'')
+        self.assertEqual(self.precmd('Place.update("", "name", "x")'),
+                         "update Place '' name x")
+
+    def test_dict(self):
+        """ A dict is passed on as written """
+        self.assertEqual(
+            self.precmd('Place.update("42", {"name": "Loft, 2"})'),
+            'update Place 42 {"name": "Loft, 2"}')
+        self.assertEqual(self.precmd('Place.update("42", {"name": )'),
+                         'update Place 42 {"name":')
+
+    def test_other_lines(self):
+        """ Lines that are not dot commands are left alone """
+        for line in ('all Place', 'Place.foo("42")', 'Place.update({})',
+                     'Place.show("42"'):
+            self.assertEqual(self.precmd(line), line)
+
+
+@unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') == 'db', 'file storage')
+class test_consoleUpdate(unittest.TestCase):
+    """ Class to test update through dot commands """
+
+    def setUp(self):
+        """ Stores a place """
+        clear_storage()
+        self.place = Place(name='Loft', max_guest=2)
+        storage.new(self.place)
+
+    def tearDown(self):
+        """ Empty storage and remove the file """
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def update(self, args):
+        """ Runs Place.update(<id>, args), returns what it printed """
+        return run('Place.update("{}", {})'.format(self.place.id, args))
+
+    def test_quoted_comma(self):
+        """ A comma inside quotes stays in the value """
+        self.assertEqual(self.update('"name", "Loft, by the bay"'), '')
+        self.assertEqual(self.place.name, 'Loft, by the bay')
+
+    def test_dict(self):
+        """ Every attribute is set and converted, then saved once """
+        with mock.patch.object(Place, 'save', autospec=True) as save:
+            self.assertEqual(self.update(
+                '{"name": "Big loft", "max_guest": "4", "latitude": 1}'), '')
+        self.assertEqual(self.place.name, 'Big loft')
+        self.assertEqual(self.place.max_guest, 4)
+        self.assertEqual(self.place.latitude, 1.0)
+        self.assertIsInstance(self.place.latitude, float)
+        save.assert_called_once_with(self.place)
+
+    def test_dict_keeps_id(self):
+        """ id and the dates are not taken from the dict """
+        _id = self.place.id
+        self.update('{"id": "42", "name": "Big loft"}')
+        self.assertEqual(self.place.id, _id)
+        self.assertEqual(self.place.name, 'Big loft')
+
+    def test_type_incorrect(self):
+        """ A value that does not convert leaves the place unchanged """
+        self.assertEqual(self.update('{"name": "Big loft", '
+                                     '"max_guest": "many"}'),
+                         '** value type incorrect **\n')
+        self.assertEqual(self.place.name, 'Loft')
+        self.assertEqual(self.place.max_guest, 2)
+
+    def test_invalid_dict(self):
+        """ A dict that does not parse is reported """
+        for args in ('{"name": ', '{"name" "Loft"}', '{1, 2}'):
+            self.assertEqual(self.update(args),
+                             '** invalid dictionary **\n')
+        self.assertEqual(self.place.name, 'Loft')
+
+
+@unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') == 'db', 'file storage')
+class test_consoleAll(unittest.TestCase):
+    """ Class to test the all command and its options """
+
+    def setUp(self):
+        """ Stores two states and a place """
+        clear_storage()
+        self.states = [State(name='Nevada'), State(name='Ohio')]
+        for obj in self.states + [Place(name='Loft')]:
+            storage.new(obj)
+
+    def tearDown(self):
+        """ Empty storage """
+        clear_storage()
+
+    def test_list(self):
+        """ The objects stream out as the list all used to print """
+        self.assertEqual(run('all State'),
+                         str([str(s) for s in self.states]) + '\n')
+        self.assertEqual(run('State.all()'), run('all State'))
+        self.assertEqual(run('all'), str(
+            [str(o) for o in storage.all().values()]) + '\n')
+
+    def test_limit(self):
+        """ --limit stops after that many objects """
+        self.assertEqual(run('all State --limit 1'),
+                         str([str(self.states[0])]) + '\n')
+        self.assertEqual(run('all --limit 0'), '[]\n')
+
+    def test_fields(self):
+        """ --fields keeps those attributes, skipping the missing ones """
+        self.assertEqual(
+            run('all State --fields name,nothing --limit 1'),
+            str(["[State] ({}) {{'name': 'Nevada'}}".format(
+                self.states[0].id)]) + '\n')
+
+    def test_ndjson(self):
+        """ --ndjson prints one to_dict per line, dates as to_dict has """
+        lines = run('all State --ndjson').splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [s.to_dict() for s in self.states])
+        self.assertEqual(run('all State --ndjson --fields name,created_at'
+                             ' --limit 1'),
+                         json.dumps({
+                             'name': 'Nevada',
+                             'created_at':
+                                 self.states[0].created_at.isoformat()})
+                         + '\n')
+
+    def test_errors(self):
+        """ A bad option or class prints an error and nothing else """
+        for line, error in (
+                ('all State --limit', '--limit value missing'),
+                ('all State --fields', '--fields value missing'),
+                ('all State --limit two', 'limit must be a number'),
+                ('all State --limit -1', 'limit must be a number'),
+                ('all State --json', 'unknown option --json'),
+                ('all Nowhere', "class doesn't exist")):
+            self.assertEqual(run(line), '** {} **\n'.format(error))
+
+
+@unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') == 'db', 'file storage')
+class test_consoleTransactions(unittest.TestCase):
+    """ Class to test begin, commit, rollback and --batch """
+
+    def setUp(self):
+        """ Empty storage """
+        clear_storage()
+
+    def tearDown(self):
+        """ End any transaction, empty storage and remove the file """
+        FileStorage._FileStorage__transaction = None
+        HBNBCommand.batch = False
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def saved(self):
+        """ Returns the names of the states in the file """
+        try:
+            with open('file.json') as f:
+                objects = json.load(f)
+        except FileNotFoundError:
+            return []
+        return sorted(v['name'] for v in objects.values()
+                      if v['__class__'] == 'State')
+
+    def batch(self, script):
+        """ Runs console.batch() over script as stdin """
+        with mock.patch('sys.stdin', io.StringIO(script)), \
+                redirect_stdout(io.StringIO()):
+            console.batch()
+
+    def test_commit(self):
+        """ Nothing is written before commit, everything at commit """
+        run('begin', 'create State name="A"', 'create State name="B"')
+        self.assertEqual(self.saved(), [])
+        run('commit')
+        self.assertEqual(self.saved(), ['A', 'B'])
+
+    def test_rollback(self):
+        """ rollback drops what was created since begin """
+        run('create State name="A"', 'begin', 'create State name="B"',
+            'rollback')
+        self.assertEqual([s.name for s in storage.iter(State)], ['A'])
+        self.assertEqual(self.saved(), ['A'])
+
+    def test_errors(self):
+        """ Nested begin, and commit or rollback outside a transaction """
+        self.assertEqual(run('commit'), '** no transaction in progress **\n')
+        self.assertEqual(run('rollback'),
+                         '** no transaction in progress **\n')
+        self.assertEqual(run('begin', 'begin'),
+                         '** transaction already in progress **\n')
+
+    def test_batch(self):
+        """ --batch commits the whole input at its end """
+        self.batch('create State name="A"\ncreate State name="B"\n')
+        self.assertEqual(self.saved(), ['A', 'B'])
+
+    def test_batch_commit(self):
+        """ A commit inside --batch starts the next transaction """
+        self.batch('create State name="A"\ncommit\n'
+                   'create State name="B"\nrollback\n')
+        self.assertEqual(self.saved(), ['A'])
+
+    def test_batch_error(self):
+        """ A failing command rolls the whole input back """
+        with self.assertRaises(ValueError):
+            self.batch('create State name="A"\ncreate State name=x=y\n')
+        self.assertEqual(storage.count(State), 0)
+        self.assertEqual(self.saved(), [])
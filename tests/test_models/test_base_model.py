@@ -97,3 +97,19 @@ class test_basemodel(unittest.TestCase):
         n = new.to_dict()
         new = BaseModel(**n)
         self.assertFalse(new.created_at == new.updated_at)
+
+    def test_kwargs_no_microseconds(self):
+        """ isoformat without microseconds is accepted """
+        i = self.value()
+        i.created_at = i.created_at.replace(microsecond=0)
+        new = self.value(**i.to_dict())
+        self.assertEqual(new.created_at, i.created_at)
+
+    def test_kwargs_epoch(self):
+        """ Timestamps as epoch microseconds round trip """
+        from models.base_model import epoch_time
+        i = self.value()
+        copy = i.to_dict()
+        copy['created_at'] = epoch_time(i.created_at)
+        new = self.value(**copy)
+        self.assertEqual(new.created_at, i.created_at)
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+""" Module for testing the snapshot codecs """
+import io
+import json
+import os
+import tempfile
+import unittest
+from models.engine.codec import codecs, convert, get_codec, iter_items
+
+ITEMS = [('State.{}'.format(i),
+          {'id': str(i), 'name': 'S{}'.format(i), 'n': i * 1.5,
+           '__class__': 'State'}) for i in range(20)]
+ITEMS.append(('BaseModel.x', {'id': 'x', 'extra': [1, None],
+                              '__class__': 'BaseModel'}))
+
+
+class test_codecs(unittest.TestCase):
+    """ Class to test every registered codec """
+
+    def dumped(self, codec):
+        """ Returns a file object holding ITEMS in codec """
+        f = io.BytesIO() if codec.binary else io.StringIO()
+        codec.dump(iter(ITEMS), f)
+        f.seek(0)
+        return f
+
+    def test_round_trip(self):
+        """ Each codec loads back what it dumped """
+        for codec in codecs.values():
+            with self.subTest(codec=codec.name):
+                self.assertEqual(list(codec.load(self.dumped(codec))), ITEMS)
+
+    def test_pickle_frames(self):
+        """ The pickle codec round trips several frames """
+        codec = get_codec('pickle')
+        batch_size, codec.batch_size = codec.batch_size, 3
+        try:
+            self.assertEqual(list(codec.load(self.dumped(codec))), ITEMS)
+        finally:
+            codec.batch_size = batch_size
+
+    def test_empty_snapshot(self):
+        """ Each codec round trips an empty snapshot """
+        for codec in codecs.values():
+            with self.subTest(codec=codec.name):
+                f = io.BytesIO() if codec.binary else io.StringIO()
+                codec.dump(iter(()), f)
+                f.seek(0)
+                self.assertEqual(list(codec.load(f)), [])
+
+    def test_json_layout(self):
+        """ The json codec writes what json.dump would """
+        f = self.dumped(get_codec('json'))
+        self.assertEqual(f.getvalue(), json.dumps(dict(ITEMS)))
+
+    def test_empty_file(self):
+        """ An empty binary file is not a valid snapshot """
+        for name in ('json', 'pickle'):
+            codec = get_codec(name)
+            f = io.BytesIO() if codec.binary else io.StringIO()
+            with self.assertRaises(ValueError):
+                list(codec.load(f))
+
+    def test_unknown_codec(self):
+        """ Unknown codec names raise ValueError """
+        with self.assertRaises(ValueError):
+            get_codec('yaml')
+
+    def test_iter_items(self):
+        """ The json snapshot is parsed one record at a time """
+        text = json.dumps(dict(ITEMS), indent=2)
+        self.assertEqual(list(iter_items(io.StringIO(text), 7)), ITEMS)
+        with self.assertRaises(ValueError):
+            list(iter_items(io.StringIO(text[:-3]), 7))
+
+    def test_convert(self):
+        """ convert rewrites a snapshot picking codecs by extension """
+        folder = tempfile.mkdtemp()
+        source = os.path.join(folder, 'file.json')
+        middle = os.path.join(folder, 'file.pickle')
+        target = os.path.join(folder, 'file.jsonl')
+        with open(source, 'w') as f:
+            json.dump(dict(ITEMS), f)
+        self.assertEqual(convert(source, middle), len(ITEMS))
+        self.assertEqual(convert(middle, target), len(ITEMS))
+        with open(target) as f:
+            self.assertEqual(list(get_codec('schema').load(f)), ITEMS)
+        for path in (source, middle, target):
+            os.remove(path)
+        os.rmdir(folder)
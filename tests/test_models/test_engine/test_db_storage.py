@@ -0,0 +1,321 @@
+#!/usr/bin/python3
+""" Module for testing db storage against sqlite """
+import ast
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from sqlalchemy import event, inspect
+import console
+from models.city import City
+from models.engine.db_storage import DBStorage
+from models.state import State
+from tests.test_console import run
+
+
+class dbStorageMixin:
+    """ Runs each test on a new DBStorage over an sqlite file, with the
+    environment variables of env """
+
+    env = {}
+
+    def setUp(self):
+        """ Points a new DBStorage at a temporary sqlite file """
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        env = {'HBNB_MYSQL_URL': 'sqlite:///' + self.path, 'HBNB_ENV': ''}
+        env.update(self.env)
+        with mock.patch.dict(os.environ, env):
+            self.storage = DBStorage()
+        self.storage.reload()
+
+    def tearDown(self):
+        """ Removes the sqlite file """
+        self.storage.close()
+        self.storage._DBStorage__engine.dispose()
+        os.remove(self.path)
+
+
+class test_dbStorage(dbStorageMixin, unittest.TestCase):
+    """ Class to test the db storage on an sqlite file """
+
+    def test_url(self):
+        """ HBNB_MYSQL_URL picks the database """
+        state = State(name='California')
+        self.storage.new(state)
+        self.storage.save()
+        self.storage.close()
+        self.assertEqual(self.storage.count(State), 1)
+        self.assertEqual(self.storage.get(State, state.id).name, 'California')
+
+    def test_bulk_new(self):
+        """ bulk_new inserts in batches, save() commits them """
+        states = [State(name='State{}'.format(i)) for i in range(5)]
+        self.assertEqual(self.storage.bulk_new(iter(states), batch_size=2),
+                         5)
+        self.storage.save()
+        self.storage.close()
+        self.assertEqual(self.storage.count(State), 5)
+        self.assertEqual(self.storage.get(State, states[3].id).name,
+                         'State3')
+
+    def test_bulk_new_rollback(self):
+        """ Rows inserted by bulk_new go away with the transaction """
+        self.storage.begin()
+        self.storage.bulk_new([State(name='Texas')])
+        self.storage.rollback()
+        self.assertEqual(self.storage.count(State), 0)
+
+    def test_stats(self):
+        """ Checkouts and checkins are counted """
+        self.storage.count(State)
+        self.storage.close()
+        stats = self.storage.stats()
+        self.assertEqual(stats['connects'], 1)
+        self.assertGreaterEqual(stats['checkouts'], 1)
+        self.assertEqual(stats['checkouts'], stats['checkins'])
+        self.assertEqual(stats['checkedout'], 0)
+        self.assertGreaterEqual(stats['wait_total'], stats['wait_max'])
+
+    def test_idle_connections_not_pinged(self):
+        """ A connection checked in moments ago is not pinged """
+        for i in range(3):
+            self.storage.count(State)
+            self.storage.close()
+        self.assertEqual(self.storage.stats()['pings'], 0)
+
+    def test_queries(self):
+        """ Every statement is counted """
+        queries = self.storage.stats()['queries']
+        self.storage.all(State)
+        self.storage.count(State)
+        self.assertEqual(self.storage.stats()['queries'], queries + 2)
+
+    def test_load_needs_class(self):
+        """ Eager loading is only for the objects of one class """
+        with self.assertRaises(ValueError):
+            self.storage.all(load=['cities'])
+
+    def test_order_by(self):
+        """ The database sorts the rows by the column asked """
+        for name in ('Nevada', 'Arizona', 'Texas', 'Ohio'):
+            self.storage.new(State(name=name))
+        self.storage.save()
+        names = [s.name for s in
+                 self.storage.all(State, order_by='name').values()]
+        self.assertEqual(names, ['Arizona', 'Nevada', 'Ohio', 'Texas'])
+        names = [s.name for s in self.storage.all(
+                 State, order_by='-name', limit=2, offset=1).values()]
+        self.assertEqual(names, ['Ohio', 'Nevada'])
+        with self.assertRaises(ValueError):
+            self.storage.all(State, order_by='name', after='')
+        with self.assertRaises(ValueError):
+            self.storage.all(order_by='name')
+
+    def test_query(self):
+        """ storage.query() runs in SQL and fetches only what it needs """
+        for name in ('Nevada', 'Arizona', 'Texas', 'Ohio'):
+            self.storage.new(State(name=name))
+        self.storage.save()
+        query = self.storage.query(State)
+        self.assertEqual(query.filter(name__ge='O').count(), 2)
+        self.assertEqual(query.filter(name='Ohio').first().name, 'Ohio')
+        rows = query.filter(name__in=['Nevada', 'Ohio', 'Utah']) \
+            .order_by('-name').only('name').all()
+        self.assertEqual(rows, [{'name': 'Ohio'}, {'name': 'Nevada'}])
+        names = [s.name for s in query.order_by('name').offset(1).limit(2)]
+        self.assertEqual(names, ['Nevada', 'Ohio'])
+
+    def test_console_all(self):
+        """ all with --limit and --fields selects just those rows and
+        columns, and prints them as in file storage """
+        states = [State(name=name) for name in ('Nevada', 'Ohio', 'Utah')]
+        for state in states:
+            self.storage.new(state)
+        self.storage.save()
+        statements = []
+        event.listen(self.storage._DBStorage__engine,
+                     'before_cursor_execute',
+                     lambda conn, cursor, statement, *args:
+                     statements.append(statement))
+        with mock.patch.object(console, 'storage', self.storage), \
+                mock.patch.object(console, 'storage_type', 'db'):
+            out = run('all State --limit 2 --fields name,nothing')
+            ndjson = run('all State --limit 1 --fields created_at --ndjson')
+        self.assertEqual(len(statements), 2)
+        self.assertIn('LIMIT', statements[0])
+        self.assertNotIn('created_at', statements[0])
+        names = {s.id: s.name for s in states}
+        for line in ast.literal_eval(out):
+            _id = line.split()[1][1:-1]
+            self.assertEqual(line, "[State] ({}) {{'name': '{}'}}".format(
+                _id, names[_id]))
+        self.assertEqual(len(ast.literal_eval(out)), 2)
+        self.assertRegex(ndjson, r'^{"created_at": "\d{4}-\d\d-\d\dT'
+                                 r'[^"]*"}\n$')
+
+    def test_search_places(self):
+        """ search_places filters in SQL, radius and distance after """
+        from models.place import Place, place_amenity
+        from sqlalchemy import insert
+        places = [Place(name=name, price_by_night=price, latitude=lat,
+                        longitude=lon, max_guest=2, city_id='c', user_id='u')
+                  for name, price, lat, lon in (
+                      ('SF', 150, 37.77, -122.42), ('Oakland', 90, 37.80,
+                      -122.27), ('LA', 120, 34.05, -118.24))]
+        for p in places:
+            self.storage.new(p)
+        self.storage.save()
+        self.storage._DBStorage__session.execute(insert(place_amenity), [
+            {'place_id': places[0].id, 'amenity_id': 'wifi'},
+            {'place_id': places[0].id, 'amenity_id': 'tv'},
+            {'place_id': places[1].id, 'amenity_id': 'wifi'}])
+        self.storage.save()
+        names = [p.name for p in self.storage.search_places(price_min=100)]
+        self.assertEqual(names, ['LA', 'SF'])
+        names = [p.name for p in self.storage.search_places(
+                 amenities=['wifi', 'tv'])]
+        self.assertEqual(names, ['SF'])
+        names = [p.name for p in self.storage.search_places(
+                 near=(37.77, -122.42, 20), sort='distance')]
+        self.assertEqual(names, ['SF', 'Oakland'])
+        names = [p.name for p in self.storage.search_places(
+                 bbox=(30, -125, 40, -110), sort='-price', limit=2)]
+        self.assertEqual(names, ['SF', 'LA'])
+
+    def test_version(self):
+        """ version() moves when rows are added, saved or deleted """
+        state = State(name='California')
+        before = self.storage.version(State, City)
+        self.storage.new(state)
+        self.storage.save()
+        added = self.storage.version(State, City)
+        self.assertNotEqual(added[0], before[0])
+        self.assertEqual(added[1], before[1])
+        self.storage.delete(state)
+        self.storage.save()
+        self.assertNotEqual(self.storage.version(State), added[:1])
+
+    def test_version_other_process(self):
+        """ An update from the console in another process moves it """
+        state = State(name='Alabama')
+        self.storage.new(state)
+        self.storage.save()
+        before = self.storage.version(State, City)
+        self.storage.close()
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+        env = dict(os.environ, PYTHONPATH=root, HBNB_TYPE_STORAGE='db',
+                   HBNB_MYSQL_URL='sqlite:///' + self.path, HBNB_ENV='')
+        subprocess.run([sys.executable, os.path.join(root, 'console.py')],
+                       input='update State {} name Zeta\n'.format(state.id),
+                       stdout=subprocess.DEVNULL, env=env, check=True,
+                       universal_newlines=True)
+        after = self.storage.version(State, City)
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+        self.assertEqual(self.storage.get(State, state.id).name, 'Zeta')
+
+    def test_version_bulk_new(self):
+        """ Rows inserted by bulk_new move it too """
+        before = self.storage.version(State)
+        self.storage.bulk_new([State(name='Texas')])
+        self.storage.save()
+        self.assertNotEqual(self.storage.version(State), before)
+
+    def test_transaction(self):
+        """ save() only flushes within a transaction """
+        self.storage.begin()
+        state = State(name='California')
+        self.storage.new(state)
+        self.storage.save()
+        self.assertEqual(self.storage.count(State), 1)
+        self.storage.rollback()
+        self.assertEqual(self.storage.count(State), 0)
+        self.storage.begin()
+        self.storage.new(State(name='Nevada'))
+        self.storage.save()
+        self.storage.commit()
+        self.storage.close()
+        self.assertEqual(self.storage.count(State), 1)
+        with self.assertRaises(ValueError):
+            self.storage.commit()
+
+    def test_create_indexes(self):
+        """ Indexes missing from existing tables are created """
+        engine = self.storage._DBStorage__engine
+        index = State.__table__.indexes.copy().pop()
+        self.assertEqual(self.storage.create_indexes(), [])
+        index.drop(engine)
+        self.assertEqual(self.storage.create_indexes(), [index.name])
+        self.assertIn(index.name, [i['name'] for i in
+                                   inspect(engine).get_indexes('states')])
+
+    @unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') != 'db', 'db storage')
+    def test_load(self):
+        """ Loading the cities along takes one query for all states """
+        for i in range(5):
+            state = State(name='State{}'.format(i))
+            self.storage.new(state)
+            for j in range(3):
+                self.storage.new(City(name='City', state_id=state.id))
+        self.storage.save()
+        for load, expected in ((None, 6), (['cities'], 2)):
+            self.storage.close()
+            queries = self.storage.stats()['queries']
+            states = self.storage.all(State, load=load).values()
+            self.assertEqual(sum(len(s.cities) for s in states), 15)
+            self.assertEqual(self.storage.stats()['queries'],
+                             queries + expected)
+
+    @unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') != 'db', 'db storage')
+    def test_load_nested(self):
+        """ A dotted path loads through several relationships """
+        state = State(name='California')
+        self.storage.new(state)
+        self.storage.new(City(name='San Francisco', state_id=state.id))
+        self.storage.save()
+        self.storage.close()
+        queries = self.storage.stats()['queries']
+        states = self.storage.all(State, load=['cities.places'])
+        for s in states.values():
+            for city in s.cities:
+                self.assertEqual(city.places, [])
+        self.assertEqual(self.storage.stats()['queries'], queries + 3)
+
+
+class test_dbStoragePool(dbStorageMixin, unittest.TestCase):
+    """ Class to test the pool settings and the pre-ping """
+
+    env = {'HBNB_MYSQL_POOL_SIZE': '2', 'HBNB_MYSQL_MAX_OVERFLOW': '1',
+           'HBNB_MYSQL_POOL_TIMEOUT': '5', 'HBNB_MYSQL_PING_IDLE': '0'}
+
+    def test_pool_options(self):
+        """ The HBNB_MYSQL_POOL_* variables reach the pool """
+        pool = self.storage._DBStorage__engine.pool
+        self.assertEqual(pool.size(), 2)
+        self.assertEqual(pool._max_overflow, 1)
+        self.assertEqual(pool._timeout, 5)
+
+    def test_every_checkout_pinged(self):
+        """ With HBNB_MYSQL_PING_IDLE=0 every checkout is pinged """
+        pings = self.storage.stats()['pings']
+        for i in range(3):
+            self.storage.count(State)
+            self.storage.close()
+        self.assertEqual(self.storage.stats()['pings'], pings + 3)
+
+    def test_dead_connection_replaced(self):
+        """ A connection failing its ping is replaced """
+        pool = self.storage._DBStorage__engine.pool
+        event.listen(pool, 'checkin', lambda conn, record: conn.close(),
+                     once=True)
+        self.storage.count(State)
+        self.storage.close()
+        self.assertEqual(self.storage.count(State), 0)
+        stats = self.storage.stats()
+        self.assertEqual(stats['ping_failures'], 1)
+        self.assertEqual(stats['invalidations'], 1)
+        self.assertEqual(stats['connects'], 2)
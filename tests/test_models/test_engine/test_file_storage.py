@@ -1,9 +1,19 @@
 #!/usr/bin/python3
 """ Module for testing file storage"""
 import unittest
+from unittest import mock
 from models.base_model import BaseModel
 from models import storage
 import os
+import json
+from models.engine.file_storage import FileStorage
+
+
+def clear_storage():
+    """ Empties the objects and indexes of storage """
+    for name in ('objects', 'raw', 'by_class', 'refs', 'ref_vals', 'dirty'):
+        getattr(storage, '_FileStorage__' + name).clear()
+    FileStorage._FileStorage__place_index = None
 
 
 class test_fileStorage(unittest.TestCase):
@@ -16,6 +26,7 @@ class test_fileStorage(unittest.TestCase):
             del_list.append(key)
         for key in del_list:
             del storage._FileStorage__objects[key]
+        clear_storage()
 
     def tearDown(self):
         """ Remove storage file at end of tests """
@@ -102,8 +113,705 @@ class test_fileStorage(unittest.TestCase):
             temp = key
         self.assertEqual(temp, 'BaseModel' + '.' + _id)
 
+    def test_all_cls(self):
+        """ all(cls) only returns the objects of that class """
+        from models.state import State
+        state = State()
+        storage.new(state)
+        storage.new(BaseModel())
+        self.assertEqual(storage.all(State), {'State.' + state.id: state})
+        self.assertEqual(storage.all('State'), {'State.' + state.id: state})
+
+    def test_all_order_by(self):
+        """ all(cls, order_by) sorts the objects by that attribute """
+        from models.state import State
+        for name in ('Nevada', 'Arizona', 'Texas'):
+            storage.new(State(name=name))
+        names = [s.name for s in storage.all(State, order_by='name').values()]
+        self.assertEqual(names, ['Arizona', 'Nevada', 'Texas'])
+        names = [s.name for s in storage.all(State, order_by='-name').values()]
+        self.assertEqual(names, ['Texas', 'Nevada', 'Arizona'])
+
+    def test_count(self):
+        """ count follows new and delete """
+        from models.state import State
+        state = State()
+        storage.new(state)
+        storage.new(BaseModel())
+        self.assertEqual(storage.count(), 2)
+        self.assertEqual(storage.count(State), 1)
+        storage.delete(state)
+        self.assertEqual(storage.count(State), 0)
+        self.assertEqual(storage.all(State), {})
+
+    def test_version(self):
+        """ version() moves with the objects of its class only """
+        from models.state import State
+        before = storage.version(State, 'City')
+        storage.new(State())
+        after = storage.version(State, 'City')
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+
+    def test_get(self):
+        """ get returns the object by class and id, or None """
+        from models.state import State
+        state = State()
+        storage.new(state)
+        self.assertIs(storage.get(State, state.id), state)
+        self.assertIs(storage.get('State', state.id), state)
+        self.assertIsNone(storage.get(BaseModel, state.id))
+        self.assertIsNone(storage.get(State, 'missing'))
+
+    def test_iter(self):
+        """ iter yields the objects of a class and survives deletes """
+        from models.state import State
+        states = [State(), State()]
+        for state in states:
+            storage.new(state)
+        storage.new(BaseModel())
+        for state in storage.iter(State):
+            storage.delete(state)
+        self.assertEqual(storage.count(State), 0)
+        self.assertEqual(len(list(storage.iter())), 1)
+
+    def test_bulk_new(self):
+        """ bulk_new adds every object, save writes them all """
+        count = storage.bulk_new(BaseModel() for i in range(3))
+        self.assertEqual(count, 3)
+        self.assertEqual(storage.count(), 3)
+        self.assertFalse(os.path.exists('file.json'))
+        storage.save()
+        with open('file.json') as f:
+            self.assertEqual(len(json.load(f)), 3)
+
     def test_storage_var_created(self):
         """ FileStorage object storage created """
         from models.engine.file_storage import FileStorage
         print(type(storage))
         self.assertEqual(type(storage), FileStorage)
+
+
+class test_fileStorageJournal(unittest.TestCase):
+    """ Class to test the journaled save mode of file storage """
+
+    def setUp(self):
+        """ Empty storage and switch journaling on """
+        clear_storage()
+        storage._FileStorage__journal = True
+
+    def tearDown(self):
+        """ Switch journaling off and remove storage files """
+        del storage._FileStorage__journal
+        clear_storage()
+        for path in ('file.json', 'file.json.journal'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        FileStorage._FileStorage__journal_len = 0
+
+    def test_save_appends_record(self):
+        """ Saving one object appends one line, snapshot untouched """
+        BaseModel().save()
+        snapshot = os.path.getsize('file.json')
+        new = BaseModel()
+        new.save()
+        self.assertEqual(os.path.getsize('file.json'), snapshot)
+        with open('file.json.journal') as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn(new.id, lines[0])
+
+    def test_reload_replays_journal(self):
+        """ Snapshot plus journal rebuild the objects """
+        first = BaseModel()
+        first.save()
+        second = BaseModel()
+        second.save()
+        first.delete()
+        clear_storage()
+        storage.reload()
+        self.assertEqual(list(storage.all().keys()),
+                         ['BaseModel.' + second.id])
+
+    def test_compaction(self):
+        """ Journal is folded into the snapshot past the threshold """
+        storage._FileStorage__journal_min = 2
+        new = BaseModel()
+        try:
+            for i in range(4):
+                new.name = str(i)
+                new.save()
+        finally:
+            del storage._FileStorage__journal_min
+        self.assertFalse(os.path.exists('file.json.journal'))
+        with open('file.json') as f:
+            self.assertEqual(json.load(f)['BaseModel.' + new.id]['name'], '3')
+
+    def test_attribute_change(self):
+        """ An attribute set on a saved object is journaled on save """
+        from models.amenity import Amenity
+        from models.place import Place
+        place = Place(name='Loft')
+        wifi = Amenity(name='Wifi')
+        storage.new(place)
+        storage.new(wifi)
+        storage.save()
+        place.name = 'Big Loft'
+        place.amenities = wifi
+        storage.save()
+        clear_storage()
+        storage.reload()
+        place = storage.get(Place, place.id)
+        self.assertEqual(place.name, 'Big Loft')
+        self.assertEqual(place.amenity_ids, [wifi.id])
+
+    def test_torn_tail(self):
+        """ A partially written record is ignored and cut off """
+        new = BaseModel()
+        new.save()
+        BaseModel().save()
+        with open('file.json.journal', 'a') as f:
+            f.write('{"op": "set", "key": "BaseM')
+        clear_storage()
+        storage.reload()
+        self.assertEqual(len(storage.all()), 2)
+        with open('file.json.journal') as f:
+            self.assertTrue(f.read().endswith('\n'))
+
+
+class test_fileStorageClose(unittest.TestCase):
+    """ Class to test that close only reloads changed files """
+
+    def setUp(self):
+        """ Empty storage """
+        clear_storage()
+
+    def tearDown(self):
+        """ Remove storage files """
+        clear_storage()
+        for path in ('file.json', 'file.json.journal'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        storage.reload()
+
+    def test_close_unchanged(self):
+        """ Objects are not rebuilt when nothing changed on disk """
+        new = BaseModel()
+        new.save()
+        storage.close()
+        self.assertIs(storage.all()['BaseModel.' + new.id], new)
+
+    def test_close_changed(self):
+        """ A snapshot written by someone else is reloaded """
+        new = BaseModel()
+        new.save()
+        other = BaseModel()
+        with open('file.json', 'w') as f:
+            json.dump({'BaseModel.' + new.id: new.to_dict(),
+                       'BaseModel.' + other.id: other.to_dict()}, f)
+        storage.close()
+        self.assertIn('BaseModel.' + other.id, storage.all())
+
+    def test_close_other_class(self):
+        """ A write to another class keeps the places and their index """
+        from models.place import Place
+        from models.state import State
+        place = Place(name='Loft', price_by_night=50)
+        storage.new(place)
+        storage.save()
+        self.assertEqual(storage.search_places(), [place])
+        index = FileStorage._FileStorage__place_index
+        before = storage.version(Place, State)
+        with open('file.json') as f:
+            objects = json.load(f)
+        other = State(name='Nevada')
+        objects['State.' + other.id] = other.to_dict()
+        with open('file.json', 'w') as f:
+            json.dump(objects, f)
+        os.utime('file.json', ns=(0, 0))
+        after = storage.version(Place, State)
+        self.assertEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+        self.assertIs(storage.get(Place, place.id), place)
+        self.assertEqual(storage.search_places(), [place])
+        self.assertIs(FileStorage._FileStorage__place_index, index)
+
+    def test_close_journal_delta(self):
+        """ Records appended by someone else are replayed alone """
+        storage._FileStorage__journal = True
+        try:
+            new = BaseModel()
+            new.save()
+            BaseModel().save()
+            other = BaseModel()
+            with open('file.json.journal', 'a') as f:
+                f.write(json.dumps({'op': 'set',
+                                    'key': 'BaseModel.' + other.id,
+                                    'obj': other.to_dict()}) + '\n')
+            storage.close()
+        finally:
+            del storage._FileStorage__journal
+        self.assertIs(storage.all()['BaseModel.' + new.id], new)
+        self.assertIn('BaseModel.' + other.id, storage.all())
+
+
+class test_fileStorageQuery(unittest.TestCase):
+    """ Class to test storage.query() """
+
+    def setUp(self):
+        """ Fills storage with places in two cities """
+        from models.place import Place
+        clear_storage()
+        self.Place = Place
+        self.places = []
+        for i, price in enumerate((80, 120, 50, 200, 120)):
+            place = Place(name='Place{}'.format(i), price_by_night=price,
+                          city_id='a' if i % 2 else 'b')
+            storage.new(place)
+            self.places.append(place)
+
+    def tearDown(self):
+        """ Empty storage """
+        clear_storage()
+
+    def test_filter(self):
+        """ filter() keeps the objects matching every condition """
+        query = storage.query(self.Place)
+        self.assertEqual(query.count(), 5)
+        self.assertEqual(set(query.filter(city_id='a').all()),
+                         {self.places[1], self.places[3]})
+        self.assertEqual(query.filter(city_id='b', price_by_night__gt=60,
+                                      price_by_night__lt=100)
+                         .all(), [self.places[0]])
+        self.assertEqual(query.filter(id=self.places[2].id).all(),
+                         [self.places[2]])
+        self.assertEqual(query.filter(name__in=['Place4', 'x']).all(),
+                         [self.places[4]])
+        self.assertEqual(query.filter(description__lt='z').all(), [])
+
+    def test_order_limit_only(self):
+        """ order_by, offset, limit and only shape the results """
+        query = storage.query(self.Place)
+        self.assertEqual(query.order_by('price_by_night').first(),
+                         self.places[2])
+        rows = query.order_by('-price_by_night', 'name').offset(1) \
+            .limit(2).only('name', 'price_by_night').all()
+        self.assertEqual(rows, [{'name': 'Place1', 'price_by_night': 120},
+                                {'name': 'Place4', 'price_by_night': 120}])
+        self.assertEqual([p.name for p in query.order_by('-name').limit(2)],
+                         ['Place4', 'Place3'])
+
+    def test_search_places(self):
+        """ search_places follows the places added after a search """
+        self.assertEqual(storage.search_places(price_max=60),
+                         [self.places[2]])
+        cheap = self.Place(name='Cheap', price_by_night=10)
+        storage.new(cheap)
+        self.assertEqual(storage.search_places(price_max=60),
+                         [cheap, self.places[2]])
+        storage.delete(cheap)
+        self.assertEqual(storage.search_places(price_max=60),
+                         [self.places[2]])
+
+
+class test_fileStorageTransactions(unittest.TestCase):
+    """ Class to test begin, commit and rollback """
+
+    def setUp(self):
+        """ Saves one object """
+        clear_storage()
+        self.kept = BaseModel()
+        storage.new(self.kept)
+        storage.save()
+
+    def tearDown(self):
+        """ Ends any transaction and removes the storage file """
+        try:
+            storage.rollback()
+        except ValueError:
+            pass
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def test_commit(self):
+        """ Saves wait for commit, which writes them all """
+        storage.begin()
+        new = BaseModel()
+        new.save()
+        storage.delete(self.kept)
+        storage.save()
+        with open('file.json') as f:
+            self.assertEqual(list(json.load(f)), ['BaseModel.' + self.kept.id])
+        storage.commit()
+        with open('file.json') as f:
+            self.assertEqual(list(json.load(f)), ['BaseModel.' + new.id])
+
+    def test_rollback(self):
+        """ Rollback brings back the objects as they were at begin """
+        storage.begin()
+        BaseModel().save()
+        self.kept.name = 'changed'
+        storage.new(self.kept)
+        storage.rollback()
+        self.assertEqual(list(storage.all()), ['BaseModel.' + self.kept.id])
+        self.assertFalse(hasattr(storage.all()['BaseModel.' + self.kept.id],
+                                 'name'))
+        storage.begin()
+        storage.delete(self.kept)
+        storage.rollback()
+        self.assertEqual(storage.count(), 1)
+
+    def test_errors(self):
+        """ Transactions do not nest, commit needs one """
+        with self.assertRaises(ValueError):
+            storage.commit()
+        with self.assertRaises(ValueError):
+            storage.rollback()
+        storage.begin()
+        with self.assertRaises(ValueError):
+            storage.begin()
+
+    def test_other_thread(self):
+        """ A save in another thread waits for the transaction to end,
+        and cannot end it """
+        import threading
+        storage.begin()
+        other = BaseModel()
+        errors = []
+        saved = threading.Event()
+
+        def save():
+            try:
+                storage.commit()
+            except ValueError as e:
+                errors.append(e)
+            other.save()
+            saved.set()
+        thread = threading.Thread(target=save)
+        thread.start()
+        self.assertFalse(saved.wait(0.2))
+        self.assertEqual(len(errors), 1)
+        storage.commit()
+        thread.join(5)
+        self.assertTrue(saved.is_set())
+        with open('file.json') as f:
+            self.assertIn('BaseModel.' + other.id, json.load(f))
+
+
+class test_fileStorageRelations(unittest.TestCase):
+    """ Class to test the relationship getters backed by storage """
+
+    def setUp(self):
+        """ Empty storage """
+        clear_storage()
+
+    def tearDown(self):
+        """ Empty storage and remove the storage file """
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def test_state_cities(self):
+        """ State.cities returns the cities of that state only """
+        from models.state import State
+        from models.city import City
+        california, nevada = State(name='California'), State(name='Nevada')
+        napa = City(name='Napa', state_id=california.id)
+        reno = City(name='Reno', state_id=nevada.id)
+        for obj in (california, nevada, napa, reno):
+            storage.new(obj)
+        self.assertEqual(california.cities, [napa])
+        self.assertEqual(nevada.cities, [reno])
+
+    def test_foreign_key_update(self):
+        """ Changing a foreign key and saving moves the object """
+        from models.state import State
+        from models.city import City
+        california, nevada = State(name='California'), State(name='Nevada')
+        napa = City(name='Napa', state_id=california.id)
+        storage.new(napa)
+        napa.state_id = nevada.id
+        storage.new(napa)
+        self.assertEqual(california.cities, [])
+        self.assertEqual(nevada.cities, [napa])
+        storage.delete(napa)
+        self.assertEqual(nevada.cities, [])
+
+    def test_foreign_key_set(self):
+        """ Setting a foreign key alone moves the object too """
+        from models.state import State
+        from models.city import City
+        california, nevada = State(name='California'), State(name='Nevada')
+        napa = City(name='Napa', state_id=california.id)
+        storage.new(napa)
+        storage.save()
+        napa.state_id = nevada.id
+        storage.save()
+        self.assertEqual(california.cities, [])
+        self.assertEqual(nevada.cities, [napa])
+
+    def test_place_reviews(self):
+        """ Place.reviews and User.reviews return their reviews """
+        from models.place import Place
+        from models.review import Review
+        from models.user import User
+        user = User()
+        place = Place(user_id=user.id)
+        review = Review(place_id=place.id, user_id=user.id)
+        storage.new(place)
+        storage.new(review)
+        self.assertEqual(place.reviews, [review])
+        self.assertEqual(user.reviews, [review])
+        self.assertEqual(user.places, [place])
+
+    def test_place_amenities(self):
+        """ Place.amenities resolves amenity_ids through storage """
+        from models.place import Place
+        from models.amenity import Amenity
+        place = Place()
+        wifi = Amenity(name='Wifi')
+        storage.new(wifi)
+        place.amenities = wifi
+        place.amenities = wifi
+        self.assertEqual(place.amenities, [wifi])
+        self.assertEqual(Place().amenity_ids, [])
+
+
+class test_fileStorageLazy(unittest.TestCase):
+    """ Class to test the lazy hydration mode of file storage """
+
+    def setUp(self):
+        """ Save a few objects, then reload them lazily """
+        from models.state import State
+        from models.city import City
+        clear_storage()
+        self.state = State(name='California')
+        self.city = City(name='Napa', state_id=self.state.id)
+        storage.new(self.state)
+        storage.new(self.city)
+        storage.save()
+        clear_storage()
+        storage._FileStorage__lazy = True
+        storage.reload()
+
+    def tearDown(self):
+        """ Switch lazy mode off and remove the storage file """
+        del storage._FileStorage__lazy
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def test_nothing_hydrated(self):
+        """ reload builds no instance, count still works """
+        from models.state import State
+        self.assertEqual(len(storage._FileStorage__objects), 0)
+        self.assertEqual(storage.count(), 2)
+        self.assertEqual(storage.count(State), 1)
+
+    def test_hydrate_per_class(self):
+        """ all(cls) only builds the instances of cls """
+        from models.state import State
+        states = storage.all(State)
+        self.assertEqual(list(states), ['State.' + self.state.id])
+        self.assertEqual(list(storage._FileStorage__objects),
+                         ['State.' + self.state.id])
+        self.assertEqual(storage.count(), 2)
+
+    def test_hydrate_keeps_version(self):
+        """ Building the instances of records is no change """
+        from models.state import State
+        version = storage.version(State)
+        storage.all(State)
+        self.assertEqual(storage.version(State), version)
+
+    def test_get_and_related(self):
+        """ get builds one object, related hydrates the child class """
+        from models.state import State
+        state = storage.get(State, self.state.id)
+        self.assertEqual(state.name, 'California')
+        self.assertEqual([c.name for c in state.cities], ['Napa'])
+
+    def test_save_keeps_pending_records(self):
+        """ Records never hydrated are written back by save """
+        from models.state import State
+        storage.all(State)
+        storage.save()
+        with open('file.json') as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+
+class test_fileStorageWrites(unittest.TestCase):
+    """ Class to test atomic, durable and coalesced saves """
+
+    def setUp(self):
+        """ Empty storage """
+        clear_storage()
+
+    def tearDown(self):
+        """ Restore the defaults and remove the storage file """
+        for name in ('durability', 'persist', 'codec'):
+            storage.__dict__.pop('_FileStorage__' + name, None)
+        storage.sync()
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def test_failed_write_keeps_file(self):
+        """ A save failing midway leaves the previous file whole """
+        from models.engine.codec import JSONCodec
+
+        class Failing(JSONCodec):
+            """ Writes a little, then fails """
+            @staticmethod
+            def dump(items, f):
+                f.write('{"half')
+                raise OSError("disk full")
+
+        BaseModel().save()
+        with open('file.json') as f:
+            before = f.read()
+        storage._FileStorage__codec = Failing
+        with self.assertRaises(OSError):
+            BaseModel().save()
+        with open('file.json') as f:
+            self.assertEqual(f.read(), before)
+        self.assertEqual([p for p in os.listdir('.') if p.endswith('.tmp')],
+                         [])
+
+    def test_group_durability(self):
+        """ Group commit defers the fsync until sync runs """
+        storage._FileStorage__durability = 'group'
+        BaseModel().save()
+        self.assertIn('file.json', storage._FileStorage__unsynced)
+        storage.sync()
+        self.assertEqual(storage._FileStorage__unsynced, set())
+
+    def test_saves_coalesce(self):
+        """ Saves requested during a write share the next write """
+        import threading
+        import time
+        calls = []
+        started = threading.Event()
+
+        def persist():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+
+        storage._FileStorage__persist = persist
+        first = threading.Thread(target=storage.save)
+        first.start()
+        started.wait()
+        others = [threading.Thread(target=storage.save) for i in range(5)]
+        for thread in others:
+            thread.start()
+        for thread in [first] + others:
+            thread.join()
+        self.assertEqual(len(calls), 2)
+
+
+class test_fileStorageShared(unittest.TestCase):
+    """ Class to test several processes sharing the storage file """
+
+    def setUp(self):
+        """ Empty storage and switch the shared mode on """
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+        storage._FileStorage__shared = True
+        storage.reload()
+
+    def tearDown(self):
+        """ Switch shared mode off and remove storage files """
+        for name in ('shared', 'lazy', 'mmap'):
+            storage.__dict__.pop('_FileStorage__' + name, None)
+        clear_storage()
+        for path in ('file.json', 'file.json.lock'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def in_child(self, func):
+        """ Runs func in a forked process and waits for it """
+        import multiprocessing
+        process = multiprocessing.get_context('fork').Process(target=func)
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+
+    def test_no_lost_writes(self):
+        """ Objects saved by another process survive our next save """
+        mine, theirs, later = BaseModel(), BaseModel(), BaseModel()
+        mine.save()
+        self.in_child(theirs.save)
+        later.save()
+        with open('file.json') as f:
+            keys = set(json.load(f))
+        self.assertEqual(keys, {'BaseModel.' + o.id
+                                for o in (mine, theirs, later)})
+
+    def test_close_follows_generation(self):
+        """ close only reloads when another process wrote """
+        mine = BaseModel()
+        mine.save()
+        storage.close()
+        self.assertIs(storage.get(BaseModel, mine.id), mine)
+        theirs = BaseModel()
+        self.in_child(theirs.save)
+        self.in_child(mine.delete)
+        storage.close()
+        self.assertIsNotNone(storage.get(BaseModel, theirs.id))
+        self.assertIsNone(storage.get(BaseModel, mine.id))
+
+    def test_mmap_records(self):
+        """ Lazy records can stay in the memory-mapped snapshot """
+        from models.engine.records import Span
+        mine = BaseModel()
+        mine.save()
+        clear_storage()
+        storage._FileStorage__lazy = True
+        storage._FileStorage__mmap = True
+        storage.reload()
+        raw = storage._FileStorage__raw['BaseModel']
+        self.assertIsInstance(raw['BaseModel.' + mine.id], Span)
+        self.assertEqual(storage.get(BaseModel, mine.id).to_dict(),
+                         mine.to_dict())
+
+    def test_mmap_replaced(self):
+        """ A snapshot replaced while it is scanned does not mix files """
+        import mmap
+        mine = BaseModel()
+        mine.save()
+        other = {'BaseModel.x': {'__class__': 'BaseModel', 'id': 'x' * 99}}
+        with open('other.json', 'w') as f:
+            json.dump(other, f)
+        map_file = mmap.mmap
+
+        def replaced(*args, **kwargs):
+            buf = map_file(*args, **kwargs)
+            os.replace('other.json', 'file.json')
+            return buf
+        clear_storage()
+        storage._FileStorage__shared = False
+        storage._FileStorage__lazy = True
+        storage._FileStorage__mmap = True
+        with mock.patch.object(mmap, 'mmap', replaced):
+            storage.reload()
+        self.assertEqual(storage.get(BaseModel, mine.id).to_dict(),
+                         mine.to_dict())
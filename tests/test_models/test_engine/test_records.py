@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+""" Module for testing the compact records of file storage """
+import sys
+import unittest
+from models.base_model import BaseModel
+from models.engine.records import record_type
+from models.place import Place
+
+
+class test_records(unittest.TestCase):
+    """ Class to test the slot-backed records """
+
+    def test_round_trip(self):
+        """ A record gives back the dict it was built from """
+        d = Place(name='Loft', number_rooms=2, city_id='c').to_dict()
+        d['amenity_ids'] = ['a']
+        record = record_type(Place).from_dict(d)
+        self.assertEqual(record.to_dict(), d)
+        self.assertEqual(record.to_dict()['__class__'], 'Place')
+
+    def test_missing_fields(self):
+        """ Columns absent from the dict stay absent """
+        d = {'id': '1', '__class__': 'Place'}
+        self.assertEqual(record_type(Place).from_dict(d).to_dict(), d)
+
+    def test_base_model(self):
+        """ Models without a table get the BaseModel columns """
+        d = BaseModel().to_dict()
+        self.assertEqual(record_type(BaseModel).from_dict(d).to_dict(), d)
+
+    def test_smaller_than_dict(self):
+        """ A record takes less memory than the dict """
+        d = Place(name='Loft', number_rooms=2, city_id='c').to_dict()
+        record = record_type(Place).from_dict(d)
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertLess(sys.getsizeof(record), sys.getsizeof(d))
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+""" Module for testing the place search """
+import unittest
+from models.engine import search
+from models.engine.search import GridIndex, PlaceIndex, parse_criteria
+from models.place import Place
+
+
+def place(name, price, lat=None, lon=None, guests=1, amenity_ids=()):
+    """ Returns a Place with those attributes """
+    return Place(name=name, price_by_night=price, latitude=lat,
+                 longitude=lon, max_guest=guests,
+                 amenity_ids=list(amenity_ids))
+
+
+class test_search(unittest.TestCase):
+    """ Class to test the search helpers and the place index """
+
+    def setUp(self):
+        """ Indexes a few places """
+        self.sf = place('SF', 150, 37.77, -122.42, 4, ['wifi', 'tv'])
+        self.oak = place('Oakland', 90, 37.80, -122.27, 2, ['wifi'])
+        self.la = place('LA', 120, 34.05, -118.24, 6, ['tv'])
+        self.fiji = place('Fiji', 60, -17.71, 178.07, 2)
+        self.nowhere = place('Nowhere', 30)
+        self.index = PlaceIndex([self.sf, self.oak, self.la, self.fiji,
+                                 self.nowhere])
+
+    def test_parse_criteria(self):
+        """ Strings turn into typed criteria """
+        self.assertEqual(parse_criteria({
+            'price_max': '100', 'amenities': 'a,b', 'near': '1,2,3',
+            'sort': 'distance', 'guests': ''}),
+            {'price_max': 100, 'amenities': ['a', 'b'],
+             'near': (1.0, 2.0, 3.0), 'sort': 'distance'})
+        for params in ({'price_max': 'x'}, {'bbox': '1,2'},
+                       {'color': 'red'}, {'sort': 'distance'}):
+            with self.assertRaises(ValueError):
+                parse_criteria(params)
+
+    def test_distance(self):
+        """ Great circle distances in km """
+        self.assertAlmostEqual(search.distance(0, 0, 0, 1), 111.19, 2)
+        self.assertAlmostEqual(search.distance(37.77, -122.42, 34.05,
+                                               -118.24), 559, 0)
+
+    def test_grid(self):
+        """ A box gets the values of the cells it overlaps """
+        grid = GridIndex(1)
+        grid.add(10.5, 10.5, 'a')
+        grid.add(12.5, 10.5, 'b')
+        grid.add(0.5, 179.5, 'c')
+        grid.add(0.5, -179.5, 'd')
+        self.assertEqual(grid.search((10, 10, 11, 11)), ['a'])
+        self.assertEqual(sorted(grid.search((0, 0, 20, 20))), ['a', 'b'])
+        self.assertEqual(sorted(grid.search((0, 179, 1, -179))), ['c', 'd'])
+
+    def test_price(self):
+        """ Results come cheapest first, within the price range """
+        self.assertEqual(self.index.search(),
+                         [self.nowhere, self.fiji, self.oak, self.la, self.sf])
+        self.assertEqual(self.index.search(price_min=60, price_max=120),
+                         [self.fiji, self.oak, self.la])
+        self.assertEqual(self.index.search(sort='-price', limit=2),
+                         [self.sf, self.la])
+        self.assertEqual(self.index.search(offset=1, limit=2),
+                         [self.fiji, self.oak])
+
+    def test_ties(self):
+        """ Places of one price come in id order, both ways """
+        same = [place('Same{}'.format(i), 100) for i in range(4)]
+        ids = sorted(p.id for p in same)
+        index = PlaceIndex(same + [self.sf, self.nowhere])
+        self.assertEqual([p.id for p in index.search(price_min=100,
+                                                     price_max=100)], ids)
+        self.assertEqual([p.id for p in index.search(sort='-price')[1:5]],
+                         ids)
+        self.assertEqual([p.id for p in index.search(
+            sort='-price', price_max=100, limit=2)], ids[:2])
+
+    def test_capacity_and_amenities(self):
+        """ Minimum guests and every amenity asked for """
+        self.assertEqual(self.index.search(guests=4), [self.la, self.sf])
+        self.assertEqual(self.index.search(amenities=['wifi']),
+                         [self.oak, self.sf])
+        self.assertEqual(self.index.search(amenities=['wifi', 'tv']),
+                         [self.sf])
+        self.assertEqual(self.index.search(amenities=['pool']), [])
+
+    def test_location(self):
+        """ Bounding boxes and radius searches """
+        self.assertEqual(self.index.search(bbox=(37, -123, 38, -122)),
+                         [self.oak, self.sf])
+        self.assertEqual(self.index.search(near=(37.77, -122.42, 20)),
+                         [self.oak, self.sf])
+        self.assertEqual(self.index.search(near=(37.77, -122.42, 20),
+                                           sort='distance'),
+                         [self.sf, self.oak])
+        self.assertEqual(self.index.search(near=(37.77, -122.42, 600),
+                                           guests=3, sort='distance'),
+                         [self.sf, self.la])
+        self.assertEqual(self.index.search(near=(-17.7, -179.9, 300)),
+                         [self.fiji])
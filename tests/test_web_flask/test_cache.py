@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+""" Module for testing the page cache """
+import gzip
+import json
+import os
+import subprocess
+import sys
+import unittest
+from models import storage
+from models.city import City
+from models.state import State
+from tests.test_models.test_engine.test_file_storage import clear_storage
+from tests.test_web_flask.test_states import load_app
+from web_flask import cache
+from web_flask.cache import PageCache
+
+
+class test_pageCache(unittest.TestCase):
+    """ Class to test the LRU and TTL bounds of the cache """
+
+    def setUp(self):
+        """ A cache on a clock the tests move """
+        self.now = 0
+        self.cache = PageCache(size=2, ttl=10, clock=lambda: self.now)
+
+    def test_versions(self):
+        """ A page is only served for the versions it was made with """
+        self.cache.put('a', (1,), 'page')
+        self.assertEqual(self.cache.get('a', (1,)), 'page')
+        self.assertIsNone(self.cache.get('a', (2,)))
+        self.assertIsNone(self.cache.get('a', (1,)))
+
+    def test_ttl(self):
+        """ A page expires after ttl seconds """
+        self.cache.put('a', (), 'page')
+        self.now = 9
+        self.assertEqual(self.cache.get('a', ()), 'page')
+        self.now = 10
+        self.assertIsNone(self.cache.get('a', ()))
+
+    def test_lru(self):
+        """ The least recently used page goes first """
+        self.cache.put('a', (), 'A')
+        self.cache.put('b', (), 'B')
+        self.cache.get('a', ())
+        self.cache.put('c', (), 'C')
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get('b', ()))
+        self.assertEqual(self.cache.get('a', ()), 'A')
+        self.assertEqual(self.cache.get('c', ()), 'C')
+
+
+@unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') == 'db', 'file storage')
+class test_cachedRoutes(unittest.TestCase):
+    """ Class to test the cached /states routes """
+
+    def setUp(self):
+        """ Saves a state with a city """
+        clear_storage()
+        self.module = load_app('9-states')
+        self.client = self.module.app.test_client()
+        self.state = State(name='California')
+        storage.new(self.state)
+        storage.new(City(name='Fresno', state_id=self.state.id))
+        storage.save()
+
+    def tearDown(self):
+        """ Removes the storage file """
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def test_hit(self):
+        """ The second request is served from the cache """
+        cache = self.module.cache
+        first = self.client.get('/states').data
+        hits = cache.hits
+        self.assertEqual(self.client.get('/states').data, first)
+        self.assertEqual(cache.hits, hits + 1)
+
+    def test_new(self):
+        """ A new object of a class the page shows invalidates it """
+        self.client.get('/states/' + self.state.id)
+        storage.new(City(name='Sacramento', state_id=self.state.id))
+        self.assertIn(b'Sacramento',
+                      self.client.get('/states/' + self.state.id).data)
+
+    def test_other_process(self):
+        """ A write to the file by another process invalidates it """
+        self.client.get('/states')
+        with open('file.json') as f:
+            objects = json.load(f)
+        other = State(name='Nevada')
+        objects['State.' + other.id] = other.to_dict()
+        with open('file.json', 'w') as f:
+            json.dump(objects, f)
+        os.utime('file.json', ns=(0, 0))
+        self.assertIn(b'Nevada', self.client.get('/states').data)
+
+    def test_other_process_destroy(self):
+        """ An object destroyed by the console in another process goes """
+        self.client.get('/states')
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        env = dict(os.environ, PYTHONPATH=root)
+        subprocess.run([sys.executable, os.path.join(root, 'console.py')],
+                       input='destroy State {}\n'.format(self.state.id),
+                       stdout=subprocess.DEVNULL, env=env, check=True,
+                       universal_newlines=True)
+        self.assertNotIn(b'California', self.client.get('/states').data)
+
+    def test_etag(self):
+        """ A request with the current ETag gets a 304, without render """
+        response = self.client.get('/states')
+        tag = response.headers['ETag']
+        self.module.cache.clear()
+        response = self.client.get('/states',
+                                   headers={'If-None-Match': tag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(len(self.module.cache), 0)
+        storage.new(State(name='Nevada'))
+        response = self.client.get('/states',
+                                   headers={'If-None-Match': tag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], tag)
+
+    def test_etag_other_worker(self):
+        """ Tags hold in another worker only where storage is shared """
+        tag = self.client.get('/states').headers['ETag']
+        # what another worker or a restart looks like
+        self.module.cache.token = os.urandom(8)
+        response = self.client.get('/states',
+                                   headers={'If-None-Match': tag})
+        self.assertEqual(response.status_code, 200)
+        storage._FileStorage__shared = True
+        try:
+            tag = self.client.get('/states').headers['ETag']
+            self.module.cache.token = os.urandom(8)
+            self.module.cache.clear()
+            response = self.client.get('/states',
+                                       headers={'If-None-Match': tag})
+            self.assertEqual(response.status_code, 304)
+        finally:
+            del storage._FileStorage__shared
+            try:
+                os.remove('file.json.lock')
+            except FileNotFoundError:
+                pass
+
+    def test_gzip(self):
+        """ Large pages are compressed once for the clients accepting it """
+        self.module.cache.compress_min = 0
+        plain = self.client.get('/states')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        headers = {'Accept-Encoding': 'gzip'}
+        response = self.client.get('/states', headers=headers)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertNotEqual(response.headers['ETag'], plain.headers['ETag'])
+        again = self.client.get('/states', headers=headers)
+        self.assertEqual(again.data, response.data)
+        response = self.client.get('/states', headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_pages(self):
+        """ Pages under compress_min bytes are sent as they are """
+        self.module.cache.compress_min = 1 << 20
+        response = self.client.get('/states',
+                                   headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    @unittest.skipIf(cache.brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        """ brotli is preferred when installed and accepted """
+        self.module.cache.compress_min = 0
+        plain = self.client.get('/states').data
+        response = self.client.get('/states',
+                                   headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(cache.brotli.decompress(response.data), plain)
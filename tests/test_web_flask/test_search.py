@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+""" Module for testing the /search route """
+import os
+import unittest
+from models import storage
+from models.place import Place
+from tests.test_models.test_engine.test_file_storage import clear_storage
+from tests.test_web_flask.test_states import load_app
+
+
+@unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') == 'db', 'file storage')
+class test_searchRoute(unittest.TestCase):
+    """ Class to test the pages of /search """
+
+    def setUp(self):
+        """ Stores 30 places, some at the same price """
+        clear_storage()
+        self.module = load_app('100-hbnb_search')
+        self.client = self.module.app.test_client()
+        self.places = [Place(name='Place{}'.format(i), city_id='c',
+                             user_id='u', price_by_night=i // 3 * 10)
+                       for i in range(30)]
+        for place in self.places:
+            storage.new(place)
+
+    def tearDown(self):
+        """ Empty storage """
+        clear_storage()
+
+    def search(self, query=''):
+        """ Returns the status and the JSON of /search?query """
+        response = self.client.get('/search?' + query)
+        return response.status_code, response.get_json()
+
+    def test_default_limit(self):
+        """ Without a limit, a page of default_limit places """
+        status, places = self.search()
+        self.assertEqual(status, 200)
+        self.assertEqual(len(places), self.module.default_limit)
+        self.assertEqual(len(self.search('limit=5')[1]), 5)
+
+    def test_max_limit(self):
+        """ A limit past max_limit, or below 0, is refused """
+        status, places = self.search('limit={}'.format(
+            self.module.max_limit))
+        self.assertEqual((status, len(places)), (200, 30))
+        for limit in (self.module.max_limit + 1, -1):
+            status, body = self.search('limit={}'.format(limit))
+            self.assertEqual(status, 400)
+            self.assertIn('limit', body['error'])
+
+    def test_ties(self):
+        """ Places of one price come in id order, highest price first """
+        status, places = self.search('sort=-price&limit=6')
+        top = sorted(p.id for p in self.places[27:])
+        self.assertEqual([p['id'] for p in places[:3]], top)
+        self.assertEqual([p['price_by_night'] for p in places],
+                         [90, 90, 90, 80, 80, 80])
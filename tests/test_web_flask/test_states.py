@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+""" Module for testing the /states routes and the pages of cities """
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from models import storage
+from models.city import City
+from models.state import State
+from tests.test_models.test_engine.test_file_storage import clear_storage
+
+
+def load_app(name):
+    """ Imports web_flask/<name>.py, returns the module """
+    path = os.path.join(os.path.dirname(__file__), '..', '..',
+                        'web_flask', name + '.py')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Flask finds the templates through the module registered here
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') == 'db', 'file storage')
+class test_statesThreads(unittest.TestCase):
+    """ Hammers the /states routes from many threads """
+
+    threads = 16
+    requests = 50
+
+    def setUp(self):
+        """ Fills storage with a few states and cities """
+        clear_storage()
+        self.app = load_app('9-states').app
+        self.states = []
+        for i in range(20):
+            state = State(name='State{:02}'.format(i))
+            storage.new(state)
+            storage.new(City(name='City', state_id=state.id))
+            self.states.append(state)
+        storage.save()
+
+    def tearDown(self):
+        """ Removes the storage file """
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def test_concurrent_requests(self):
+        """ Every request succeeds while another thread writes """
+        errors = []
+        statuses = []
+        done = threading.Event()
+
+        def read(n):
+            client = self.app.test_client()
+            try:
+                for i in range(self.requests):
+                    if i % 2:
+                        state = self.states[(n + i) % len(self.states)]
+                        response = client.get('/states/' + state.id)
+                    else:
+                        response = client.get('/states')
+                    statuses.append(response.status_code)
+            except Exception as e:
+                errors.append(e)
+
+        def write():
+            try:
+                while not done.is_set():
+                    state = State(name='Temp')
+                    storage.new(state)
+                    storage.new(City(name='Temp', state_id=state.id))
+                    storage.save()
+                    storage.delete(state)
+                    storage.save()
+            except Exception as e:
+                errors.append(e)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        readers = [threading.Thread(target=read, args=(n,))
+                   for n in range(self.threads)]
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        done.set()
+        writer.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(statuses, [200] * self.threads * self.requests)
+        self.assertEqual(storage.count(State), len(self.states))
+
+
+@unittest.skipIf(os.getenv('HBNB_TYPE_STORAGE') == 'db', 'file storage')
+class test_citiesOrder(unittest.TestCase):
+    """ Every page lists the cities of a state by name """
+
+    def setUp(self):
+        """ Stores a state whose cities are not added in name order """
+        clear_storage()
+        self.state = State(name='California')
+        storage.new(self.state)
+        for name in ('Zeta', 'Alpha', 'Mid'):
+            storage.new(City(name=name, state_id=self.state.id))
+
+    def tearDown(self):
+        """ Empty storage and remove the file """
+        clear_storage()
+        try:
+            os.remove('file.json')
+        except FileNotFoundError:
+            pass
+
+    def cities(self, name, url):
+        """ Returns the city names on the page at url, in order """
+        page = load_app(name).app.test_client().get(url)
+        return [n for n in re.findall(r'<b>([^<]*)</b>', page.get_data(True))
+                if n != 'California']
+
+    def test_cities_by_states(self):
+        """ /cities_by_states sorts the cities """
+        self.assertEqual(
+            self.cities('8-cities_by_states', '/cities_by_states'),
+            ['Alpha', 'Mid', 'Zeta'])
+
+    def test_state(self):
+        """ /states/<id> sorts them the same way """
+        self.assertEqual(self.cities('9-states', '/states/' + self.state.id),
+                         ['Alpha', 'Mid', 'Zeta'])
+
+
+# fills a sqlite database with n states, then prints the number of
+# queries the first request of each page took, for each n
+page_queries = """
+import json
+from models import storage
+from models.amenity import Amenity
+from models.city import City
+from models.state import State
+from tests.test_web_flask.test_states import load_app
+counts = {}
+for n in (2, 10):
+    for i in range(n):
+        state = State(name='State{}'.format(i))
+        storage.new(state)
+        for j in range(3):
+            storage.new(City(name='City{}'.format(j), state_id=state.id))
+        storage.new(Amenity(name='Amenity{}'.format(i)))
+    storage.save()
+    for name, url in (('8-cities_by_states', '/cities_by_states'),
+                      ('10-hbnb_filters', '/hbnb_filters')):
+        client = load_app(name).app.test_client()
+        queries = storage.stats()['queries']
+        assert client.get(url).status_code == 200
+        counts.setdefault(url, []).append(
+            storage.stats()['queries'] - queries)
+print(json.dumps(counts))
+"""
+
+
+class test_pageQueries(unittest.TestCase):
+    """ The pages listing states and their cities run a fixed number of
+    queries, however many states there are """
+
+    def test_constant(self):
+        """ 2 and 10 states take as many queries on db storage """
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        env = dict(os.environ, PYTHONPATH=root, HBNB_TYPE_STORAGE='db',
+                   HBNB_MYSQL_URL='sqlite:///' + path, HBNB_ENV='')
+        try:
+            out = subprocess.run([sys.executable, '-c', page_queries],
+                                 stdout=subprocess.PIPE, env=env, cwd=root,
+                                 check=True, universal_newlines=True).stdout
+        finally:
+            os.remove(path)
+        for url, (few, many) in json.loads(out).items():
+            self.assertEqual(few, many, url)
+            self.assertLessEqual(many, 4, url)
@@ -4,17 +4,19 @@ from flask import Flask, render_template
 from models import storage
 from models.state import State
 from models.amenity import Amenity
+from models.city import City
+from web_flask.cache import PageCache
 
 app = Flask(__name__)
+cache = PageCache()
 
 
 @app.route('/hbnb_filters', strict_slashes=False)
+@cache.page(State, City, Amenity)
 def hbnb_filters():
     """Display a HTML page with filters for states and amenities"""
-    states = storage.all(State).values()
-    amenities = storage.all(Amenity).values()
-    states = sorted(states, key=lambda state: state.name)
-    amenities = sorted(amenities, key=lambda amenity: amenity.name)
+    states = storage.all(State, load=['cities'], order_by='name').values()
+    amenities = storage.query(Amenity).order_by('name').only('name').all()
     return render_template('10-hbnb_filters.html', states=states, amenities=amenities)
 
 
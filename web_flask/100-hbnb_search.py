@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+"""Starts a Flask web application that searches places"""
+import os
+from flask import Flask, jsonify, request
+from models import storage
+from models.engine.search import parse_criteria
+
+app = Flask(__name__)
+# a page holds limit places, HBNB_SEARCH_LIMIT when the query string
+# has none and never more than HBNB_SEARCH_MAX_LIMIT
+default_limit = int(os.getenv('HBNB_SEARCH_LIMIT', '20'))
+max_limit = int(os.getenv('HBNB_SEARCH_MAX_LIMIT', '100'))
+
+
+@app.route('/search', strict_slashes=False)
+def search():
+    """Returns as JSON the places matching the query string criteria
+
+    e.g. /search?price_max=120&guests=2&amenities=<id>,<id>
+    &near=37.77,-122.42,5&sort=distance&limit=20
+    """
+    try:
+        criteria = parse_criteria(request.args.to_dict())
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    criteria.setdefault('limit', default_limit)
+    if not 0 <= criteria['limit'] <= max_limit:
+        return jsonify(error="limit must be between 0 and {}".format(
+            max_limit)), 400
+    places = storage.search_places(**criteria)
+    return jsonify([place.to_dict() for place in places])
+
+
+@app.teardown_appcontext
+def teardown_db(exception):
+    """Closes the storage on teardown"""
+    storage.close()
+
+if __name__ == "__main__":
+    app.run(host='0.0.0.0', port=5000)
@@ -5,8 +5,10 @@ Flask web application to display a list of states.
 from flask import Flask, render_template
 from models import storage
 from models.state import State
+from web_flask.cache import PageCache
 
 app = Flask(__name__)
+cache = PageCache()
 
 
 @app.teardown_appcontext
@@ -16,10 +18,10 @@ def teardown_db(exception):
 
 
 @app.route('/states_list', strict_slashes=False)
+@cache.page(State)
 def states_list():
     """Displays a HTML page with a list of states"""
-    states = storage.all(State).values()
-    states = sorted(states, key=lambda state: state.name)
+    states = storage.query(State).order_by('name').only('id', 'name').all()
     return render_template('7-states_list.html', states=states)
 
 
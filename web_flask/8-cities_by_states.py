@@ -1,9 +1,12 @@
 #!/usr/bin/python3
 from flask import Flask, render_template
 from models import storage
+from models.city import City
 from models.state import State
+from web_flask.cache import PageCache
 
 app = Flask(__name__)
+cache = PageCache()
 
 @app.teardown_appcontext
 def teardown_db(exception):
@@ -11,9 +14,10 @@ def teardown_db(exception):
     storage.close()
 
 @app.route('/cities_by_states', strict_slashes=False)
+@cache.page(State, City)
 def cities_by_states():
     """Displays a HTML page with a list of states and cities"""
-    states = storage.all(State).values()
+    states = storage.all(State, load=['cities'], order_by='name').values()
     return render_template('8-cities_by_states.html', states=states)
 
 
@@ -2,25 +2,30 @@
 """Starts a Flask web application that displays states and cities"""
 from flask import Flask, render_template
 from models import storage
+from models.city import City
 from models.state import State
+from web_flask.cache import PageCache
 
 app = Flask(__name__)
+cache = PageCache()
 
 
 @app.route('/states', strict_slashes=False)
+@cache.page(State)
 def states_list():
     """Displays a HTML page with the list of all State objects"""
-    states = storage.all(State).values()
-    states = sorted(states, key=lambda state: state.name)
+    states = storage.query(State).order_by('name').only('id', 'name').all()
     return render_template('9-states.html', states=states)
 
 
 @app.route('/states/<id>', strict_slashes=False)
+@cache.page(State, City)
 def state_cities_list(id):
     """Displays a HTML page with the list of cities for a given state"""
     state = storage.get(State, id)
     if state:
-        cities = sorted(state.cities, key=lambda city: city.name)
+        cities = storage.query(City).filter(state_id=state.id) \
+            .order_by('name').only('id', 'name').all()
         return render_template('9-state.html', state=state, cities=cities)
     else:
         return render_template('9-not_found.html')
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""Caches the pages rendered by the web_flask routes"""
+import functools
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, request
+from models import storage
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compressors = {'gzip': lambda data: gzip.compress(data, 6, mtime=0)}
+if brotli is not None:
+    compressors['br'] = lambda data: brotli.compress(data, quality=5)
+
+
+class Page:
+    """A rendered page, with its compressed forms made on demand"""
+    __slots__ = ('body', 'encoded')
+
+    def __init__(self, body):
+        """Keeps the page as UTF-8 bytes"""
+        self.body = body.encode()
+        self.encoded = {}
+
+    def encode(self, encoding):
+        """Returns the page compressed with encoding, made only once"""
+        data = self.encoded.get(encoding)
+        if data is None:
+            data = self.encoded[encoding] = compressors[encoding](self.body)
+        return data
+
+
+class PageCache:
+    """A least recently used cache of rendered pages
+
+    Each page is stored with the storage versions of the classes it was
+    rendered from, and is served again only while those versions have
+    not moved, so no write, from this process or the console, can leave
+    it stale. At most size pages are kept, each for ttl seconds.
+    HBNB_CACHE_SIZE and HBNB_CACHE_TTL set the defaults, 256 and 60.
+
+    Pages get a strong ETag made of those versions, so a request whose
+    If-None-Match still holds is answered 304 from the versions alone,
+    without rendering, even once the page left the cache. The tags are
+    made of storage.shared_version(), the same in every worker and
+    across restarts: the DBStorage counters, or the generation of a
+    shared FileStorage. Where there is none, the versions only mean
+    something in this process, and the tags also carry a token of the
+    cache.
+
+    Pages of HBNB_COMPRESS_MIN bytes or more, 1024 by default, are sent
+    with gzip, or brotli when it is installed, if the client accepts
+    it; the compressed bytes are kept along with the page.
+    """
+
+    def __init__(self, size=None, ttl=None, clock=time.monotonic,
+                 compress_min=None):
+        """Starts an empty cache"""
+        self.size = size if size is not None else \
+            int(os.getenv('HBNB_CACHE_SIZE', '256'))
+        self.ttl = ttl if ttl is not None else \
+            float(os.getenv('HBNB_CACHE_TTL', '60'))
+        self.compress_min = compress_min if compress_min is not None else \
+            int(os.getenv('HBNB_COMPRESS_MIN', '1024'))
+        self.clock = clock
+        self.token = os.urandom(8)
+        self.hits = 0
+        self.misses = 0
+        self.__pages = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, versions):
+        """Returns the page cached under key for those versions, or None"""
+        with self.__lock:
+            entry = self.__pages.get(key)
+            if entry is None or entry[1] != versions or \
+                    entry[0] <= self.clock():
+                if entry is not None:
+                    del self.__pages[key]
+                self.misses += 1
+                return None
+            self.__pages.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, versions, page):
+        """Caches page under key, dropping the least recently used"""
+        with self.__lock:
+            self.__pages[key] = (self.clock() + self.ttl, versions, page)
+            self.__pages.move_to_end(key)
+            while len(self.__pages) > self.size:
+                self.__pages.popitem(last=False)
+
+    def clear(self):
+        """Drops every page"""
+        with self.__lock:
+            self.__pages.clear()
+
+    def __len__(self):
+        return len(self.__pages)
+
+    def page(self, *model_classes):
+        """Decorates a view whose page only depends on those classes
+
+        The page is cached per path and query string. A view that does
+        not return a string is left alone.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def cached_view(*args, **kwargs):
+                key = (view.__name__, request.full_path)
+                versions = storage.version(*model_classes)
+                shared = storage.shared_version(versions)
+                if shared is None:
+                    material = self.token + repr((key, versions)).encode()
+                else:
+                    material = repr((key, shared)).encode()
+                tag = hashlib.sha1(material).hexdigest()
+                for encoding in (None,) + tuple(compressors):
+                    if request.if_none_match.contains(
+                            self.__tag(tag, encoding)):
+                        return self.__response(b'', tag, encoding, 304)
+                page = self.get(key, versions)
+                if page is None:
+                    body = view(*args, **kwargs)
+                    if not isinstance(body, str):
+                        return body
+                    page = Page(body)
+                    self.put(key, versions, page)
+                encoding = None
+                if len(page.body) >= self.compress_min:
+                    encoding = request.accept_encodings.best_match(
+                        tuple(compressors)[::-1])
+                # the tag of the request, not of the render: with a
+                # shared generation it can move while the page holds
+                if encoding is None:
+                    return self.__response(page.body, tag, None)
+                return self.__response(page.encode(encoding), tag, encoding)
+            return cached_view
+        return decorator
+
+    @staticmethod
+    def __tag(tag, encoding):
+        """Returns the ETag of one encoding of the page"""
+        return tag if encoding is None else tag + '-' + encoding
+
+    def __response(self, data, tag, encoding, status=200):
+        response = Response(data, status, mimetype='text/html')
+        response.set_etag(self.__tag(tag, encoding))
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        if encoding is not None and status == 200:
+            response.headers['Content-Encoding'] = encoding
+        return response